@@ -6,21 +6,31 @@ class PercolationModel2D(object):
     Object that calculates and displays behaviour of 2D cellular automata
     '''
 
-    def __init__(self, ni):
+    def __init__(self, ni, seed=None):
         '''
         Constructor reads:
         N = side of grid
+        seed = seed or generator for the random draws; if None, the
+               global np.random state is used
 
         produces N x N blank grid
         '''
 
         self.N = ni
         self.Ntot = self.N * self.N
-        self.grid = np.zeros((self.N, self.N))
-        self.nextgrid = np.zeros((self.N, self.N))
-        self.tested = np.zeros((self.N, self.N))
+        self.grid = np.zeros((self.N, self.N), dtype=np.int8)
+        self.nextgrid = np.zeros((self.N, self.N), dtype=np.int8)
+        self.tested = np.zeros((self.N, self.N), dtype=np.int8)
+        self.ntested = 0
         self.complete = False
 
+        self.rng = np.random if seed is None else np.random.default_rng(seed)
+
+        # Buffers for the colonisation masks, reused across steps
+        self._padded = np.zeros((self.N + 2, self.N + 2), dtype=bool)
+        self._rows = np.zeros((self.N + 2, self.N), dtype=bool)
+        self._colonised = np.zeros((self.N, self.N), dtype=bool)
+
     def getMooreNeighbourhood(self, i, j):
         '''
         Returns a set of indices corresponding to the Moore Neighbourhood
@@ -63,10 +73,12 @@ class PercolationModel2D(object):
         return indices
 
     def check_complete(self):
+        '''
+        Checks whether every cell has been tested, using the count of
+        tested cells kept by ApplyPercolationModelRule
+        '''
 
-        ntested = np.sum(self.tested)
-
-        if (ntested == self.N * self.N):
+        if (self.ntested == self.Ntot):
             self.complete = True
 
         return self.complete
@@ -76,9 +88,7 @@ class PercolationModel2D(object):
         Places a random selection of zeros and ones into grid
         '''
 
-        for i in range(self.N):
-            for j in range(self.N):
-                self.grid[i, j] = np.rint(np.random.random())
+        self.grid[:] = np.rint(self.rng.random((self.N, self.N)))
 
     def randomise_with_symmetry(self):
 
@@ -101,10 +111,36 @@ class PercolationModel2D(object):
     def updateGrid(self):
         '''
         Takes the changes queued up on self.nextgrid, and applies them to self.grid
+
+        The two grids are swapped rather than reallocated; self.nextgrid is
+        overwritten entirely by the next application of the rule.
+        '''
+
+        self.grid, self.nextgrid = self.nextgrid, self.grid
+
+    def getColonisedCells(self, colonisers):
+        '''
+        Returns a boolean mask of the cells in the (periodic) Moore
+        Neighbourhood of any cell in the boolean mask colonisers
+
+        The mask is an OR of shifted views of a periodically padded copy,
+        taken along rows and columns in turn.
         '''
 
-        self.grid = np.copy(self.nextgrid)
-        self.nextgrid = np.zeros((self.N, self.N))
+        padded, rows, colonised = self._padded, self._rows, self._colonised
+
+        padded[1:-1, 1:-1] = colonisers
+        padded[0, 1:-1] = colonisers[-1]
+        padded[-1, 1:-1] = colonisers[0]
+        padded[:, 0] = padded[:, -2]
+        padded[:, -1] = padded[:, 1]
+
+        np.logical_or(padded[:, :-2], padded[:, 1:-1], out=rows)
+        rows |= padded[:, 2:]
+        np.logical_or(rows[:-2], rows[1:-1], out=colonised)
+        colonised |= rows[2:]
+
+        return colonised
 
     def ApplyPercolationModelRule(self, P):
         '''
@@ -113,32 +149,154 @@ class PercolationModel2D(object):
 
         1. Cells attempt to colonise their Moore Neighbourhood with probability P
         2. Cells do not make the attempt with probability 1-P
+
+        All cells are updated at once. Colonisers only ever colonise empty
+        cells, so the result does not depend on the order of the cells; the
+        random numbers are drawn in one batch, in the same row-major order
+        as by a cell-by-cell update.
+        '''
+
+        grid, nextgrid = self.grid, self.nextgrid
+        tested = self.tested.view(bool)
+
+        np.copyto(nextgrid, grid)
+
+        # Untested colonisers decide whether to colonise
+        active = (grid == 1) & ~tested
+        nactive = np.count_nonzero(active)
+
+        if (nactive == 0):
+            return
+
+        success = self.rng.random(nactive) < P
+        nextgrid[active] = np.where(success, 1, -1)
+
+        if success.any():
+            colonisers = np.zeros_like(active)
+            colonisers[active] = success
+
+            empty = (grid == 0) & ~tested
+            nextgrid[self.getColonisedCells(colonisers) & empty] = 1
+
+        tested |= active
+        self.ntested += nactive
+
+
+class FrontierPercolationModel2D(PercolationModel2D):
+    '''
+    Percolation model that only visits the frontier of the colonisation
+
+    Only untested colonisers can change the grid, so the model keeps
+    their flat indices in a sorted frontier array and only touches
+    their Moore Neighbourhoods. The cost of a step is proportional to
+    the size of the frontier instead of the area of the grid. Given
+    the same random numbers, the grids are the same as those of
+    PercolationModel2D.
+
+    The grid is updated in place: self.nextgrid is the same array as
+    self.grid, and updateGrid does nothing. The frontier is collected
+    from the grid before the first step; call resetFrontier after
+    editing the grid of a running model.
+    '''
+
+    # Row and column offsets of the Moore Neighbourhood
+    _offsets = np.array(
+        [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if di or dj]
+    )
+
+    def __init__(self, ni, seed=None):
+        super().__init__(ni, seed)
+
+        self.nextgrid = self.grid
+        self.frontier = None
+
+    def resetFrontier(self):
+        '''
+        Collects the untested colonisers of the grid into the frontier
+        '''
+
+        active = (self.grid == 1) & ~self.tested.view(bool)
+        self.frontier = np.flatnonzero(active)
+
+    def getMooreNeighbourhoods(self, indices):
+        '''
+        Returns the flat indices of the (periodic) Moore Neighbourhoods
+        of the cells with flat indices indices, one row per cell
+        '''
+
+        i, j = np.divmod(indices, self.N)
+        i = (i[:, None] + self._offsets[:, 0]) % self.N
+        j = (j[:, None] + self._offsets[:, 1]) % self.N
+
+        return i * self.N + j
+
+    def updateGrid(self):
+        '''
+        Does nothing, as the rule is applied to self.grid in place
+        '''
+
+    def ApplyPercolationModelRule(self, P):
+        '''
+        Applies the Percolation Model Rules to the frontier:
+
+        1. Cells attempt to colonise their Moore Neighbourhood with probability P
+        2. Cells do not make the attempt with probability 1-P
+
+        The cells colonised in this step form the next frontier.
         '''
 
-        for i in range(self.N):
-            for j in range(self.N):
+        if self.frontier is None:
+            self.resetFrontier()
+
+        frontier = self.frontier
+        if (len(frontier) == 0):
+            return
 
-                if (self.tested[i, j] == 1):
-                    self.nextgrid[i, j] = self.grid[i, j]
-                    continue
+        grid = self.grid.reshape(-1)
+        tested = self.tested.view(bool).reshape(-1)
 
-                # If cell contains a coloniser, then decide whether to colonise
-                if (self.grid[i, j] == 1 and self.tested[i, j] == 0):
+        # The frontier is sorted, so that the random numbers are drawn
+        # in the same order as by PercolationModel2D
+        success = self.rng.random(len(frontier)) < P
+        grid[frontier] = np.where(success, 1, -1)
+        tested[frontier] = True
+        self.ntested += len(frontier)
 
-                    randtest = np.random.rand()
+        neighbours = self.getMooreNeighbourhoods(frontier[success]).ravel()
+        neighbours = neighbours[(grid[neighbours] == 0) & ~tested[neighbours]]
 
-                    # If colonisation occurs
-                    if (randtest < P):
-                        self.nextgrid[i, j] = 1
-                        indices = self.getMooreNeighbourhood(i, j)
+        self.frontier = np.unique(neighbours)
+        grid[self.frontier] = 1
+
+    def run(self, P, max_steps=None):
+        '''
+        Applies the rule until the frontier is empty, or for at most
+        max_steps steps, and returns the number of steps taken
+        '''
+
+        for nsteps, _ in self.snapshots(P, max_steps, copy=False):
+            pass
+
+        return nsteps
+
+    def snapshots(self, P, max_steps=None, copy=True):
+        '''
+        Applies the rule step by step, like run, and yields the number
+        of the step and a copy of the grid after every step, starting
+        with the initial grid at step 0
+
+        If copy is False, the grid itself is yielded, which changes
+        with every step.
+        '''
 
-                        for element in indices:
-                            if (self.tested[element[0], element[1]] == 1):
-                                continue
-                            if (self.grid[element[0], element[1]] == 0):
-                                self.nextgrid[element[0], element[1]] = 1
+        if self.frontier is None:
+            self.resetFrontier()
 
-                    else:
-                        self.nextgrid[i, j] = -1
+        nsteps = 0
+        yield nsteps, self.grid.copy() if copy else self.grid
 
-                    self.tested[i, j] = 1
\ No newline at end of file
+        while len(self.frontier) > 0 and (
+                max_steps is None or nsteps < max_steps):
+            self.ApplyPercolationModelRule(P)
+            nsteps += 1
+            yield nsteps, self.grid.copy() if copy else self.grid
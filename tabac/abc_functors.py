@@ -1,10 +1,22 @@
 """Approximate Bayesian Computation methods."""
 
+import copy
+import os
+
+from collections import deque
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
 from tqdm import tqdm
-from scipy.stats import norm, multivariate_normal
+from scipy.special import logsumexp
 import numpy as np
 
+from tabac.cache import collect_stats
+from tabac.cache import merge_stats
+from tabac.helpers import effective_sample_size
+from tabac.helpers import normal_logpdf
+from tabac.helpers import split_rhat
+
 
 class ABCResult(namedtuple(
         'ABCResult',
@@ -20,6 +32,388 @@ class ABCResult(namedtuple(
     __slots__ = ()
 
 
+def _simulate_chunk(
+    simulation_fn,
+    distance_fn,
+    y,
+    size,
+    batch_size=None,
+    seed=None,
+    threshold=None,
+):
+    """Simulate a chunk of samples and calculate their distances.
+
+    Parameters
+    ----------
+    simulation_fn : callable
+        Simulation function. If `batch_size` is `None`, calling
+        ``simulation_fn()`` needs to result in a tuple of parameters
+        and sample. Otherwise, calling ``simulation_fn(k)`` needs to
+        result in a tuple consisting of a parameter matrix of shape
+        `(k, p)` and a stacked array of `k` samples. If `seed` is set,
+        the function is called with an additional `seed` keyword
+        argument holding a `np.random.Generator`.
+
+    distance_fn : callable
+        Function for calculating the distance between observed and
+        simulated samples. If it provides a ``batch_distance(y, zs)``
+        method, all samples of the chunk are scored with one call.
+
+    y : np.array or array_like
+        Observed sample.
+
+    size : int
+        Number of samples in the chunk.
+
+    batch_size : int or None
+        If set, simulate the whole chunk with a single batched call.
+
+    seed : `np.random.SeedSequence` or None
+        Random stream of the chunk. Simulators that rely on the global
+        NumPy random state are seeded from the same stream.
+
+    threshold : float or None
+        Rejection threshold. If set and `distance_fn` has a true
+        `accepts_threshold` attribute, it is passed on as ``threshold``
+        keyword argument, allowing the distance calculation to stop
+        early for samples that will be rejected anyway.
+
+    Returns
+    -------
+    List of `ABCResult`
+        Results for all samples of the chunk.
+    """
+    kwargs = {}
+
+    if seed is not None:
+        np.random.seed(seed.generate_state(1))
+        kwargs['seed'] = np.random.default_rng(seed)
+
+    if batch_size is None:
+        samples = [simulation_fn(**kwargs) for _ in range(size)]
+    else:
+        thetas, batch = simulation_fn(size, **kwargs)
+        samples = list(zip(thetas, batch))
+
+    if threshold is not None and getattr(
+        distance_fn, 'accepts_threshold', False
+    ):
+        distances = [
+            distance_fn(y, s[1], threshold=threshold) for s in samples
+        ]
+    elif len(samples) > 1 and hasattr(distance_fn, 'batch_distance'):
+        distances = distance_fn.batch_distance(y, [s[1] for s in samples])
+    else:
+        distances = [distance_fn(y, s[1]) for s in samples]
+
+    return [
+        ABCResult(d, s[0], s[1])
+        for d, s in zip(distances, samples)
+    ]
+
+
+# State of a pool worker, populated once by `_init_worker` so that the
+# simulation and distance functions (and their caches) are not pickled
+# again for every chunk.
+_worker_state = {}
+
+
+def _init_worker(simulation_fn, distance_fn, y):
+    _worker_state['simulation_fn'] = simulation_fn
+    _worker_state['distance_fn'] = distance_fn
+    _worker_state['y'] = y
+
+
+def _simulate_chunk_in_worker(size, batch_size, seed, threshold):
+    chunk = _simulate_chunk(
+        _worker_state['simulation_fn'],
+        _worker_state['distance_fn'],
+        _worker_state['y'],
+        size,
+        batch_size,
+        seed,
+        threshold,
+    )
+
+    # Report the lookups of simulation caches to the parent process.
+    return chunk, collect_stats()
+
+
+def _iter_chunks(
+    simulation_fn,
+    distance_fn,
+    y,
+    n_samples,
+    batch_size=None,
+    n_workers=1,
+    seed=None,
+    threshold=None,
+    store=None,
+):
+    """Simulate and score samples chunk by chunk.
+
+    The samples are split into chunks of `batch_size` (or single
+    samples), which are yielded as soon as they have been scored. If
+    `seed` is set or several workers are used, every chunk receives
+    its own child stream spawned from `seed`. Since the decomposition
+    into chunks does not depend on the number of workers, the results
+    are reproducible regardless of `n_workers`.
+
+    Parameters
+    ----------
+    n_workers : int or None
+        Number of worker processes. If set to `None`, all available
+        cores will be used.
+
+    seed : int, `np.random.SeedSequence`, or None
+        Root seed of the random streams.
+
+    threshold : float or None
+        Rejection threshold; see :func:`_simulate_chunk`.
+
+    store : `tabac.store.SimulationStore` or None
+        If set, the samples of every chunk are appended to this store
+        along with their random stream.
+
+    Yields
+    ------
+    List of `ABCResult`
+        Results for the samples of one chunk, in the order of the
+        chunks.
+    """
+    chunk_size = batch_size or 1
+    sizes = [
+        min(chunk_size, n_samples - start)
+        for start in range(0, n_samples, chunk_size)
+    ]
+
+    def _stored(chunk, chunk_seed=None):
+        if store is not None:
+            store.append_results(chunk, chunk_seed, batch_size)
+        return chunk
+
+    def _collected(future):
+        chunk, stats = future.result()
+        merge_stats(stats)
+        return chunk
+
+    # Flush the store once the chunks are exhausted or the caller stops
+    # early, rather than after every chunk.
+    try:
+        if n_workers == 1 and seed is None:
+            for size in sizes:
+                yield _stored(
+                    _simulate_chunk(
+                        simulation_fn,
+                        distance_fn,
+                        y,
+                        size,
+                        batch_size,
+                        threshold=threshold,
+                    )
+                )
+            return
+
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+
+        seeds = seed.spawn(len(sizes))
+
+        if n_workers == 1:
+            for size, chunk_seed in zip(sizes, seeds):
+                yield _stored(
+                    _simulate_chunk(
+                        simulation_fn,
+                        distance_fn,
+                        y,
+                        size,
+                        batch_size,
+                        chunk_seed,
+                        threshold,
+                    ),
+                    chunk_seed,
+                )
+            return
+
+        n_workers = n_workers or os.cpu_count()
+
+        # Keep only a bounded number of chunks in flight, so that memory
+        # does not grow with `n_samples` and stopping early is cheap.
+        max_pending = 2 * n_workers
+        pending = deque()
+
+        executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(simulation_fn, distance_fn, y),
+        )
+
+        try:
+            for size, chunk_seed in zip(sizes, seeds):
+                future = executor.submit(
+                    _simulate_chunk_in_worker,
+                    size,
+                    batch_size,
+                    chunk_seed,
+                    threshold,
+                )
+                pending.append((future, chunk_seed))
+                if len(pending) >= max_pending:
+                    future, chunk_seed = pending.popleft()
+                    yield _stored(_collected(future), chunk_seed)
+
+            while pending:
+                future, chunk_seed = pending.popleft()
+                yield _stored(_collected(future), chunk_seed)
+        finally:
+            executor.shutdown(cancel_futures=True)
+    finally:
+        if store is not None:
+            store.flush()
+
+
+class PriorSimulator:
+    """Picklable simulation function for the ABC samplers.
+
+    Parameters are drawn from a normal distribution around a location,
+    folded onto the non-negative reals, and passed on to a shape
+    sampler. In contrast to a closure, instances of this class can be
+    sent to worker processes.
+    """
+
+    def __init__(
+        self,
+        sample_fn,
+        theta,
+        n,
+        scale=0.25,
+        batch_sample_fn=None,
+        seed=None,
+    ):
+        """Create new simulation function.
+
+        Parameters
+        ----------
+        sample_fn : callable
+            Shape sampler. Calling ``sample_fn(n, *theta, seed=rng)``
+            needs to result in a sample with parameters `theta`.
+
+        theta : array_like
+            Location of the parameter distribution.
+
+        n : int
+            Number of points for each sample.
+
+        scale : float
+            Standard deviation of the parameter distribution.
+
+        batch_sample_fn : callable or None
+            Optional batched shape sampler. Calling
+            ``batch_sample_fn(n, *thetas.T, seed=rng)`` needs to result
+            in a stacked array of samples. If set to `None`, batches
+            will be simulated by stacking calls to `sample_fn`.
+
+        seed : int, instance of `np.random.Generator`, or `None`
+            Seed for the random number generator that is used if no
+            other generator is supplied upon calling.
+        """
+        self.sample_fn = sample_fn
+        self.theta = np.asarray(theta, dtype=float)
+        self.n = n
+        self.scale = scale
+        self.batch_sample_fn = batch_sample_fn
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, batch_size=None, seed=None):
+        """Simulate a sample or a batch of samples.
+
+        Parameters
+        ----------
+        batch_size : int or None
+            If set, simulate a batch of this size.
+
+        seed : int, instance of `np.random.Generator`, or `None`
+            Random number generator to use. If set to `None`, the
+            generator of the instance will be used.
+
+        Returns
+        -------
+        tuple
+            Parameters and sample or, if `batch_size` is set, parameter
+            matrix of shape `(batch_size, p)` and stacked samples.
+        """
+        rng = self.rng if seed is None else np.random.default_rng(seed)
+
+        if batch_size is None:
+            theta = list(np.abs(rng.normal(self.theta, self.scale)))
+            return theta, self.simulate(theta, seed=rng)
+
+        thetas = np.abs(
+            rng.normal(
+                self.theta,
+                self.scale,
+                size=(batch_size, len(self.theta)),
+            )
+        )
+
+        return thetas, self.simulate(thetas, seed=rng)
+
+    def simulate(self, theta, seed=None):
+        """Simulate samples for given parameters.
+
+        Parameters
+        ----------
+        theta : array_like
+            Parameters of shape `(p,)`, or parameter matrix of shape
+            `(k, p)` for simulating a batch of samples.
+
+        seed : int, instance of `np.random.Generator`, or `None`
+            Random number generator to use. If set to `None`, the
+            generator of the instance will be used.
+
+        Returns
+        -------
+        np.array
+            Sample or stacked samples.
+        """
+        rng = self.rng if seed is None else np.random.default_rng(seed)
+
+        if np.ndim(theta) == 1:
+            return self.sample_fn(self.n, *theta, seed=rng)
+
+        if self.batch_sample_fn is None:
+            return np.stack([
+                self.sample_fn(self.n, *t, seed=rng) for t in theta
+            ])
+
+        return self.batch_sample_fn(self.n, *np.asarray(theta).T, seed=rng)
+
+    def log_prior(self, theta):
+        """Evaluate the log-density of the parameter distribution.
+
+        Parameters
+        ----------
+        theta : array_like
+            Parameters of shape `(p,)` or `(k, p)`.
+
+        Returns
+        -------
+        float or np.array
+            Log-density of the folded normal distribution from which
+            parameters are drawn; `-np.inf` outside its support.
+        """
+        theta = np.asarray(theta, dtype=float)
+
+        with np.errstate(divide='ignore'):
+            log_p = np.logaddexp(
+                normal_logpdf(theta, self.theta, self.scale),
+                normal_logpdf(-theta, self.theta, self.scale),
+            )
+
+        log_p = np.where(theta < 0, -np.inf, log_p)
+        return log_p.sum(axis=-1)
+
+
 class RejectionSampler:
     """Rejection sampler for Approximate Bayesian Computation.
 
@@ -30,7 +424,17 @@ class RejectionSampler:
     provide a threshold, all samples will be returned.
     """
 
-    def __init__(self, y, simulation_fn, distance_fn, epsilon=None):
+    def __init__(
+        self,
+        y,
+        simulation_fn,
+        distance_fn,
+        epsilon=None,
+        batch_size=None,
+        n_workers=1,
+        seed=None,
+        store=None,
+    ):
         """Create new rejection sampler.
 
         Parameters
@@ -39,23 +443,101 @@ class RejectionSampler:
             Function for simulating a new sample. Calling ``simulation_fn()``
             needs to result in a tuple consisting of the parameters of
             the generated sample as well as the sample itself. The
-            sample needs to be of the same type as `y`.
+            sample needs to be of the same type as `y`. If `batch_size`
+            is set, calling ``simulation_fn(k)`` instead needs to result
+            in a tuple consisting of a parameter matrix of shape `(k, p)`
+            and a stacked array of `k` samples.
 
         distance_fn : callable
             Function for calculating the distance between observed and
             simulated samples. Calling ``distance_fn(y, z)`` needs to
-            yield a scalar value.
+            yield a scalar value. If the function provides a method
+            ``batch_distance(y, zs)``, chunks of samples are scored at
+            once.
 
         epsilon : float or None
             Rejection threshold. If set to `None`, the sampling
-            procedure will return all samples.
+            procedure will return all samples. Distance functions with
+            a true `accepts_threshold` attribute are called with an
+            additional ``threshold=epsilon`` keyword argument, and may
+            stop early for samples that are going to be rejected.
+
+        batch_size : int or None
+            If set, simulate samples in batches of this size using the
+            batched contract of `simulation_fn`.
+
+        n_workers : int or None
+            Number of processes for simulation and distance calculation.
+            If set to `None`, all available cores will be used. Unless
+            set to 1, `simulation_fn` and `distance_fn` must be
+            picklable.
+
+        seed : int, `np.random.SeedSequence`, or None
+            Root seed for the random streams of the simulations. If
+            `seed` is set or several workers are used, `simulation_fn`
+            is called with an additional `seed` keyword argument, and
+            every chunk of samples receives an independent stream, so
+            results do not depend on `n_workers`.
+
+        store : `tabac.store.SimulationStore` or None
+            If set, all simulated samples are appended to this store.
         """
         self.y = y
         self.simulation_fn = simulation_fn
         self.distance_fn = distance_fn
         self.epsilon = epsilon
+        self.batch_size = batch_size
+        self.n_workers = n_workers
+        self.seed = seed
+        self.store = store
 
-    def __call__(self, n_samples):
+    def iter_results(self, n_samples, n_accept=None):
+        """Perform rejection sampling, yielding results as they arrive.
+
+        Parameters
+        ----------
+        n_samples : int
+            Maximum number of samples to simulate for the rejection
+            sampling procedure.
+
+        n_accept : int or None
+            If set, stop as soon as this many samples have been
+            accepted.
+
+        Yields
+        ------
+        `ABCResult`
+            Results of the simulated samples, in order of simulation.
+            If a rejection threshold has been set, only samples that
+            fall below the threshold will be yielded.
+        """
+        n_accepted = 0
+
+        chunks = _iter_chunks(
+            self.simulation_fn,
+            self.distance_fn,
+            self.y,
+            n_samples,
+            self.batch_size,
+            self.n_workers,
+            self.seed,
+            self.epsilon,
+            self.store,
+        )
+
+        with closing(chunks), tqdm(total=n_samples, desc='Simulation') as p:
+            for chunk in chunks:
+                p.update(len(chunk))
+
+                for result in chunk:
+                    if self.epsilon is None or result.distance <= self.epsilon:
+                        yield result
+
+                        n_accepted += 1
+                        if n_accept is not None and n_accepted >= n_accept:
+                            return
+
+    def __call__(self, n_samples, n_accept=None):
         """Perform rejection sampling for a number of samples.
 
         Parameters
@@ -64,6 +546,10 @@ class RejectionSampler:
             Number of samples to simulate for the rejection sampling
             procedure.
 
+        n_accept : int or None
+            If set, stop as soon as this many samples have been
+            accepted.
+
         Returns
         -------
         List of tuples
@@ -73,26 +559,7 @@ class RejectionSampler:
             to the sample itself. If a rejection threshold has been set,
             only samples that fall below the threshold will be returned.
         """
-        samples = [
-            self.simulation_fn()
-            for _ in tqdm(range(n_samples), desc='Sample simulation')
-        ]
-
-        distances = [
-            self.distance_fn(self.y, sample[1])
-            for sample in tqdm(samples, desc='Distance calculation')
-        ]
-
-        if self.epsilon is not None:
-            return [
-                ABCResult(d, s[0], s[1])
-                for d, s in zip(distances, samples) if d <= self.espilon
-            ]
-        else:
-            return [
-                ABCResult(d, s[0], s[1])
-                for d, s in zip(distances, samples)
-            ]
+        return list(self.iter_results(n_samples, n_accept))
 
 
 class ImportanceSampler:
@@ -103,7 +570,17 @@ class ImportanceSampler:
     distances between observed and simulated samples.
     """
 
-    def __init__(self, y, simulation_fn, distance_fn, omega=1.0):
+    def __init__(
+        self,
+        y,
+        simulation_fn,
+        distance_fn,
+        omega=1.0,
+        batch_size=None,
+        n_workers=1,
+        seed=None,
+        store=None,
+    ):
         """Create new importance sampler.
 
         Parameters
@@ -112,16 +589,75 @@ class ImportanceSampler:
             Function for simulating a new sample. Calling ``simulation_fn()``
             needs to result in a tuple consisting of the parameters of
             the generated sample as well as the sample itself. The
-            sample needs to be of the same type as `y`.
+            sample needs to be of the same type as `y`. If `batch_size`
+            is set, calling ``simulation_fn(k)`` instead needs to result
+            in a tuple consisting of a parameter matrix of shape `(k, p)`
+            and a stacked array of `k` samples.
 
         distance_fn : callable
             Function for calculating the distance between observed and
             simulated samples. Calling ``distance_fn(y, z)`` needs to
-            yield a scalar value.
+            yield a scalar value. If the function provides a method
+            ``batch_distance(y, zs)``, chunks of samples are scored at
+            once.
+
+        batch_size : int or None
+            If set, simulate samples in batches of this size using the
+            batched contract of `simulation_fn`.
+
+        n_workers : int or None
+            Number of processes for simulation and distance calculation.
+            If set to `None`, all available cores will be used. Unless
+            set to 1, `simulation_fn` and `distance_fn` must be
+            picklable.
+
+        seed : int, `np.random.SeedSequence`, or None
+            Root seed for the random streams of the simulations. If
+            `seed` is set or several workers are used, `simulation_fn`
+            is called with an additional `seed` keyword argument, and
+            every chunk of samples receives an independent stream, so
+            results do not depend on `n_workers`.
+
+        store : `tabac.store.SimulationStore` or None
+            If set, all simulated samples are appended to this store.
         """
         self.y = y
         self.simulation_fn = simulation_fn
         self.distance_fn = distance_fn
+        self.batch_size = batch_size
+        self.n_workers = n_workers
+        self.seed = seed
+        self.store = store
+
+    def iter_results(self, n_samples):
+        """Perform importance sampling, yielding results as they arrive.
+
+        Parameters
+        ----------
+        n_samples : int
+            Number of samples to simulate for the importance sampling
+            procedure.
+
+        Yields
+        ------
+        `ABCResult`
+            Results of the simulated samples, in order of simulation.
+        """
+        chunks = _iter_chunks(
+            self.simulation_fn,
+            self.distance_fn,
+            self.y,
+            n_samples,
+            self.batch_size,
+            self.n_workers,
+            self.seed,
+            store=self.store,
+        )
+
+        with closing(chunks), tqdm(total=n_samples, desc='Simulation') as p:
+            for chunk in chunks:
+                p.update(len(chunk))
+                yield from chunk
 
     def __call__(self, n_samples):
         """Perform importance sampling for a number of samples.
@@ -140,21 +676,342 @@ class ImportanceSampler:
             to the observed sample, and the second entry corresponding
             to the sample itself.
         """
-        samples = [
-            self.simulation_fn()
-            for _ in tqdm(range(n_samples), desc='Sample simulation')
-        ]
+        return list(self.iter_results(n_samples))
 
-        distances = [
-            self.distance_fn(self.y, sample[1])
-            for sample in tqdm(samples, desc='Distance calculation')
-        ]
 
-        return [
-            ABCResult(d, s[0], s[1])
-            for d, s in zip(distances, samples)
-        ]
+class _SMCProposal:
+    """Picklable simulation function perturbing an SMC population.
+
+    Particles are drawn according to their weights and perturbed with a
+    Gaussian kernel. Candidates outside the support of the prior are
+    discarded and drawn anew, so that the kernel mixture is truncated
+    to the support as a whole; the constant normalisation cancels when
+    the importance weights are normalised.
+    """
+
+    def __init__(self, simulator, thetas, weights, cov):
+        self.simulator = simulator
+        self.thetas = thetas
+        self.weights = weights
+        self.cov = cov
+
+    def _draw(self, size, rng):
+        thetas = np.empty((size, self.thetas.shape[1]))
+        missing = np.arange(size)
+
+        while len(missing) > 0:
+            index = rng.choice(len(self.thetas), len(missing), p=self.weights)
+            candidates = self.thetas[index] + rng.multivariate_normal(
+                np.zeros(self.thetas.shape[1]), self.cov, len(missing)
+            )
+            valid = np.isfinite(self.simulator.log_prior(candidates))
+            thetas[missing[valid]] = candidates[valid]
+            missing = missing[~valid]
+
+        return thetas
+
+    def __call__(self, batch_size=None, seed=None):
+        rng = np.random.default_rng(seed)
+
+        if batch_size is None:
+            theta = list(self._draw(1, rng)[0])
+            return theta, self.simulator.simulate(theta, seed=rng)
+
+        thetas = self._draw(batch_size, rng)
+        return thetas, self.simulator.simulate(thetas, seed=rng)
+
+
+class SMCSampler:
+    """Sequential Monte Carlo sampler for Approximate Bayesian Computation.
+
+    This functor implements the population Monte Carlo algorithm of
+    Beaumont et al. (2009) with an adaptive threshold schedule. The
+    first population is drawn from the prior. Every following
+    population is obtained by perturbing particles of the previous one
+    with a Gaussian kernel whose covariance is twice the weighted
+    covariance of the previous population, keeping candidates whose
+    distance does not exceed the threshold, and reweighting them by
+    their prior density over the kernel mixture density. Thresholds
+    are quantiles of the distances of the previous population.
+    """
+
+    def __init__(
+        self,
+        y,
+        simulation_fn,
+        distance_fn,
+        n_generations=10,
+        quantile=0.5,
+        epsilon=None,
+        min_acceptance=0.01,
+        batch_size=None,
+        n_workers=1,
+        seed=None,
+        store=None,
+    ):
+        """Create new SMC sampler.
+
+        Parameters
+        ----------
+        y : array_like
+            Observed sample.
 
+        simulation_fn : callable
+            Simulation function drawing parameters from the prior, such
+            as :class:`PriorSimulator`. In addition to the interface of
+            the other samplers, it needs to provide ``log_prior(theta)``
+            and ``simulate(theta, seed=rng)`` methods.
+
+        distance_fn : callable
+            Function for calculating the distance between observed and
+            simulated samples. Functors with a true `accepts_threshold`
+            attribute receive the threshold of the current generation.
+
+        n_generations : int
+            Maximum number of populations, including the initial one.
+
+        quantile : float
+            Quantile of the distances of a population that is used as
+            the threshold of the next one.
+
+        epsilon : float or None
+            Final threshold. Sampling stops once it is reached.
+
+        min_acceptance : float
+            Sampling stops once the acceptance rate of a population
+            would fall below this value; the last complete population
+            is returned.
+
+        batch_size, n_workers, seed
+            See :class:`RejectionSampler`.
+
+        store : `tabac.store.SimulationStore` or None
+            If set, the samples of the initial population, which are
+            drawn from the prior, are appended to this store.
+        """
+        self.y = y
+        self.simulation_fn = simulation_fn
+        self.distance_fn = distance_fn
+        self.n_generations = n_generations
+        self.quantile = quantile
+        self.epsilon = epsilon
+        self.min_acceptance = min_acceptance
+        self.batch_size = batch_size
+        self.n_workers = n_workers
+        self.seed = seed
+        self.store = store
+
+        self.weights = None
+        self.epsilons = []
+        self.n_simulations = 0
+
+    def _population(
+        self,
+        simulation_fn,
+        n_particles,
+        threshold,
+        seed,
+        store=None,
+    ):
+        """Simulate particles until enough of them are accepted.
+
+        Returns `None` if the acceptance rate drops below the minimum.
+        """
+        max_simulations = int(np.ceil(n_particles / self.min_acceptance))
+
+        chunks = _iter_chunks(
+            simulation_fn,
+            self.distance_fn,
+            self.y,
+            max_simulations,
+            self.batch_size,
+            self.n_workers,
+            seed,
+            threshold,
+            store,
+        )
+
+        population = []
+        desc = f'Generation {len(self.epsilons)}'
+
+        with closing(chunks), tqdm(total=n_particles, desc=desc) as p:
+            for chunk in chunks:
+                self.n_simulations += len(chunk)
+                accepted = [
+                    r for r in chunk
+                    if threshold is None or r.distance <= threshold
+                ]
+                accepted = accepted[:n_particles - len(population)]
+                population.extend(accepted)
+                p.update(len(accepted))
+
+                if len(population) == n_particles:
+                    return population
+
+        return None
+
+    def _log_weights(self, thetas, previous, log_weights, cov):
+        """Calculate importance weights of a new population."""
+        diff = thetas[:, None, :] - previous[None, :, :]
+        precision = np.linalg.inv(cov)
+        _, log_det = np.linalg.slogdet(cov)
+
+        # Log-density of the Gaussian kernel between all pairs of new
+        # and previous particles; constants cancel upon normalisation.
+        log_k = -0.5 * (
+            np.einsum('ijk,kl,ijl->ij', diff, precision, diff) + log_det
+        )
+        log_q = logsumexp(log_k + log_weights[None, :], axis=1)
+        log_w = self.simulation_fn.log_prior(thetas) - log_q
+        return log_w - logsumexp(log_w)
+
+    def __call__(self, n_particles):
+        """Run the sampler.
+
+        Parameters
+        ----------
+        n_particles : int
+            Size of every population.
+
+        Returns
+        -------
+        List of `ABCResult`
+            The last complete population. The normalised weights of
+            the particles are available as the `weights` attribute,
+            and the thresholds of all populations as the `epsilons`
+            attribute.
+        """
+        seed = self.seed
+        seeds = [None] * self.n_generations
+        if seed is not None or self.n_workers != 1:
+            if not isinstance(seed, np.random.SeedSequence):
+                seed = np.random.SeedSequence(seed)
+            seeds = seed.spawn(self.n_generations)
+
+        self.epsilons = [np.inf]
+        self.n_simulations = 0
+
+        population = self._population(
+            self.simulation_fn, n_particles, None, seeds[0], self.store
+        )
+        log_weights = np.full(n_particles, -np.log(n_particles))
+
+        for generation in range(1, self.n_generations):
+            distances = np.array([r.distance for r in population])
+            threshold = np.quantile(distances, self.quantile)
+
+            if self.epsilon is not None:
+                if self.epsilons[-1] <= self.epsilon:
+                    break
+                threshold = max(threshold, self.epsilon)
+
+            thetas = np.array([r.theta for r in population], dtype=float)
+            weights = np.exp(log_weights)
+
+            cov = 2 * np.atleast_2d(
+                np.cov(thetas, rowvar=False, aweights=weights)
+            )
+            cov += 1e-12 * np.eye(len(cov))
+
+            proposal = _SMCProposal(
+                self.simulation_fn, thetas, weights / weights.sum(), cov
+            )
+
+            self.epsilons.append(threshold)
+            candidates = self._population(
+                proposal, n_particles, threshold, seeds[generation]
+            )
+
+            if candidates is None:
+                self.epsilons.pop()
+                break
+
+            population = candidates
+            log_weights = self._log_weights(
+                np.array([r.theta for r in population], dtype=float),
+                thetas,
+                log_weights,
+                cov,
+            )
+
+        self.weights = np.exp(log_weights)
+        return population
+
+
+class AdaptiveProposal:
+    """Adaptive Gaussian random walk proposal.
+
+    The proposal covariance is learned from the history of the chain as
+    in the adaptive Metropolis algorithm of Haario et al. (2001), and a
+    global scaling factor is adjusted with a Robbins--Monro recursion
+    towards a target acceptance rate (Andrieu and Thoms, 2008). The
+    step size of the adaptation decreases as ``(t + 1)**-decay``, so
+    that the adaptation diminishes over time.
+    """
+
+    def __init__(self, scale=0.25, target_acceptance=None, decay=0.6):
+        """Create new adaptive proposal.
+
+        Parameters
+        ----------
+        scale : float
+            Standard deviation of the initial, isotropic proposal.
+
+        target_acceptance : float or None
+            Target acceptance rate. If set to `None`, 0.44 is used for
+            one parameter and 0.234 for several parameters.
+
+        decay : float
+            Exponent of the adaptation step size; must be in `(0.5, 1]`.
+        """
+        if not 0.5 < decay <= 1:
+            raise ValueError('Decay of the adaptation must be in (0.5, 1]')
+
+        self.scale = scale
+        self.target_acceptance = target_acceptance
+        self.decay = decay
+
+        self.n_steps = 0
+        self.n_accepted = 0
+        self.mean = None
+        self.cov = None
+        self.log_lambda = 0.0
+
+    @property
+    def acceptance_rate(self):
+        """Return the acceptance rate of the chain so far."""
+        return self.n_accepted / max(self.n_steps, 1)
+
+    def propose(self, theta, rng):
+        """Draw a candidate around the parameters `theta`."""
+        theta = np.asarray(theta, dtype=float)
+        if self.cov is None:
+            self.mean = theta.copy()
+            self.cov = self.scale**2 * np.eye(len(theta))
+
+        # A small ridge keeps the covariance positive definite even if
+        # the chain has not moved yet.
+        cov = np.exp(self.log_lambda) * self.cov
+        cov = cov + 1e-10 * self.scale**2 * np.eye(len(theta))
+        return theta + np.linalg.cholesky(cov) @ rng.standard_normal(
+            len(theta)
+        )
+
+    def update(self, theta, accepted):
+        """Update the proposal with the next state of the chain."""
+        theta = np.asarray(theta, dtype=float)
+        target = self.target_acceptance
+        if target is None:
+            target = 0.44 if len(theta) == 1 else 0.234
+
+        self.n_steps += 1
+        self.n_accepted += bool(accepted)
+
+        w = (self.n_steps + 1) ** -self.decay
+        delta = theta - self.mean
+        self.mean = self.mean + w * delta
+        self.cov = self.cov + w * (np.outer(delta, delta) - self.cov)
+        self.log_lambda += w * (float(accepted) - target)
 
 
 class MCMCSampler:
@@ -163,13 +1020,32 @@ class MCMCSampler:
     This generic functor wraps our new MCMC sampling algorithm for
     Approximate Bayesian Computation. It requires a function for getting
     distances between observed and simulated samples.
+
+    The chain keeps track of the distance of its current state, so that
+    every step requires exactly one simulation and one distance
+    calculation.
     """
 
-    def __init__(self, y, sample_fn, distance_fn, n, omega=1.0):
-        """Create new importance sampler.
+    def __init__(
+        self,
+        y,
+        sample_fn,
+        distance_fn,
+        n,
+        omega=1.0,
+        scale=0.25,
+        gamma=10,
+        adaptive=False,
+        target_acceptance=None,
+        seed=None,
+    ):
+        """Create new MCMC sampler.
 
         Parameters
         ----------
+        y : array_like
+            Observed sample.
+
         sample_fn : Sample function, must return an array-type object
         of shape `(n,d)`, where `n` is the number of samples, and
         `d` is the dimension of the respective sample point.
@@ -177,63 +1053,372 @@ class MCMCSampler:
         distance_fn : callable
             Function for calculating the distance between observed and
             simulated samples. Calling ``distance_fn(y, z)`` needs to
-            yield a scalar value.
+            yield a scalar value. Functors with a true
+            `accepts_threshold` attribute are called with an additional
+            ``threshold`` keyword argument, and may stop early for
+            candidates that are going to be rejected.
+
+        n : int
+            Number of points for each sample.
+
+        scale : float
+            Standard deviation of the random walk proposal. Without
+            adaptation, candidates are folded onto the non-negative
+            reals.
+
+        gamma : float
+            Inverse temperature of the pseudo-likelihood
+            ``exp(-gamma * distance)``.
+
+        adaptive : bool
+            If set, use an :class:`AdaptiveProposal` that is initialised
+            with `scale`. Candidates with negative parameters are
+            rejected without simulating them.
+
+        target_acceptance : float or None
+            Target acceptance rate of the adaptive proposal.
+
+        seed : int, instance of `np.random.Generator`, or `None`
+            Seed for the random number generator of the chain. It is
+            used for proposals, acceptance decisions, and simulations.
         """
         self.n = n
         self.y = y
         self.sample_fn = sample_fn
         self.distance_fn = distance_fn
+        self.scale = scale
+        self.gamma = gamma
+        self.rng = np.random.default_rng(seed)
+
+        self.proposal = None
+        if adaptive:
+            self.proposal = AdaptiveProposal(scale, target_acceptance)
+
+    def _distance(self, X, threshold=np.inf):
+        if np.isfinite(threshold) and getattr(
+            self.distance_fn, 'accepts_threshold', False
+        ):
+            return self.distance_fn(self.y, X, threshold=threshold)
+
+        return self.distance_fn(self.y, X)
+
+    def get_sample_MCMC(self, theta_0, X_0, distance_0):
+        """Perform a single step of the chain.
+
+        Parameters
+        ----------
+        theta_0 : array_like
+            Current parameters.
+
+        X_0 : array_like
+            Current sample.
+
+        distance_0 : float
+            Distance of the current sample to the observed sample.
+
+        Returns
+        -------
+        tuple
+            Parameters, sample, and distance of the next state.
+        """
+        if self.proposal is None:
+            theta_candidate = list(
+                np.abs(self.rng.normal(theta_0, self.scale))
+            )
+        else:
+            theta_candidate = list(self.proposal.propose(theta_0, self.rng))
+
+        # The random walk proposal is symmetric, so the acceptance ratio
+        # only depends on the pseudo-likelihoods. A candidate is
+        # accepted if its distance is below this bound.
+        log_u = np.log(self.rng.uniform(0, 1))
+        threshold = distance_0 - log_u / self.gamma
 
+        # Candidates outside the support of the parameters have a prior
+        # density of zero and need not be simulated.
+        accepted = False
+        if min(theta_candidate) >= 0:
+            X_candidate = self.sample_fn(
+                self.n, *theta_candidate, seed=self.rng
+            )
+            distance = self._distance(X_candidate, threshold)
+            accepted = -self.gamma * (distance - distance_0) > log_u
 
-    def get_sample_MCMC(self,theta_0, X_0):
-        std = .25
-        U = np.random.uniform(0, 1)
-        rng = np.random.default_rng(42)
-        gamma = 10
-        l = len(theta_0)
-        cov = np.zeros((l, l))
-        np.fill_diagonal(cov, (l, l), wrap=True)
-        theta_candidate = [np.abs(norm.rvs(loc=t, scale=std)) for t in theta_0]
-        X_candidate = self.sample_fn(self.n, *theta_candidate, seed=rng)
-        numerator = np.exp(-gamma * self.distance_fn(X_candidate, self.y)) * multivariate_normal.pdf(theta_0,
-                                                                                           mean=theta_candidate,
-                                                                                           cov=cov)
-        denominator = np.exp(-gamma * self.distance_fn(X_0, self.y)) * multivariate_normal.pdf(theta_candidate, mean=theta_0,
-                                                                                     cov=cov)
-        ratio = numerator / denominator
-        if ratio > U:
-            theta_0 = theta_candidate
-            X_0 = X_candidate
-        return theta_0, X_0
+        if accepted:
+            theta_0, X_0, distance_0 = theta_candidate, X_candidate, distance
+
+        if self.proposal is not None:
+            self.proposal.update(theta_0, accepted)
+
+        return theta_0, X_0, distance_0
 
     def __call__(self, n_samples, theta_0, X_0):
-        """Perform importance sampling for a number of samples.
+        """Run the chain for a number of steps.
 
         Parameters
         ----------
         n_samples : int
-            Number of samples to simulate for the importance sampling
-            procedure.
+            Number of states of the chain.
+
+        theta_0 : array_like
+            Initial parameters.
+
+        X_0 : array_like
+            Initial sample.
 
         Returns
         -------
-        List of tuples
-            A list of tuples, with the first entry of each tuple
-            corresponding to the distance of the simulated sample
-            to the observed sample, and the second entry corresponding
-            to the sample itself.
+        List of `ABCResult`
+            The states of the chain, each consisting of the distance
+            of the sample to the observed sample, the parameters, and
+            the sample itself.
         """
-        samples = []
-        for _ in tqdm(range(n_samples)):
-            samples.append((theta_0,X_0))
-            theta_0,X_0 = self.get_sample_MCMC(theta_0,X_0)
+        results, _ = self._run(n_samples, theta_0, X_0, progress=True)
+        return results
 
-        distances = [
-            self.distance_fn(self.y, sample[1])
-            for sample in tqdm(samples, desc='Distance calculation')
+    def _run(self, n_steps, theta_0, X_0, distance_0=None, progress=False):
+        """Run the chain and return its states and the next state."""
+        theta_0 = list(theta_0)
+        if distance_0 is None:
+            distance_0 = self._distance(X_0)
+
+        results = []
+        for _ in tqdm(range(n_steps), disable=not progress):
+            results.append(ABCResult(distance_0, theta_0, X_0))
+            theta_0, X_0, distance_0 = self.get_sample_MCMC(
+                theta_0, X_0, distance_0
+            )
+
+        return results, (theta_0, X_0, distance_0)
+
+
+def _init_chain_worker(sampler):
+    _worker_state['sampler'] = sampler
+
+
+def _run_chain_segment(sampler, n_steps, state, rng, proposal):
+    """Advance one chain of a multi-chain sampler by `n_steps` steps.
+
+    Returns the states of the segment, the next state, as well as the
+    random number generator and proposal of the chain, which are passed
+    on to the next segment, possibly in a different process. The chain
+    runs on a shallow copy of `sampler`, which keeps its own random
+    number generator and proposal, so that repeated calls of a
+    multi-chain sampler start from the same state in any process.
+    """
+    sampler = copy.copy(sampler)
+    sampler.rng = rng
+    sampler.proposal = proposal
+    results, state = sampler._run(n_steps, *state)
+    return results, state, sampler.rng, sampler.proposal
+
+
+def _run_chain_segment_in_worker(n_steps, state, rng, proposal):
+    segment = _run_chain_segment(
+        _worker_state['sampler'], n_steps, state, rng, proposal
+    )
+    return segment, collect_stats()
+
+
+class MultiChainMCMCSampler:
+    """Multiple MCMC chains with convergence diagnostics.
+
+    This functor runs several chains of :class:`MCMCSampler`, possibly
+    in parallel, from different starting points. Every chain has its
+    own random stream, so results do not depend on the number of
+    workers. The chains are advanced in segments; after every segment,
+    split-R-hat and the effective sample size of the parameters are
+    calculated on the second half of the chains, and sampling stops
+    as soon as both reach their targets.
+    """
+
+    def __init__(
+        self,
+        y,
+        sample_fn,
+        distance_fn,
+        n,
+        n_chains=4,
+        n_workers=1,
+        segment_length=50,
+        rhat_target=1.01,
+        ess_target=400,
+        scale=0.25,
+        gamma=10,
+        adaptive=False,
+        target_acceptance=None,
+        seed=None,
+    ):
+        """Create new multi-chain MCMC sampler.
+
+        Parameters
+        ----------
+        y, sample_fn, distance_fn, n, scale, gamma, adaptive
+            See :class:`MCMCSampler`. Every chain adapts its own
+            proposal.
+
+        target_acceptance
+            See :class:`MCMCSampler`.
+
+        n_chains : int
+            Number of chains.
+
+        n_workers : int or None
+            Number of worker processes. If set to `None`, all available
+            cores will be used.
+
+        segment_length : int
+            Number of steps by which every chain is advanced between
+            two convergence checks.
+
+        rhat_target : float or None
+            Sampling stops once split-R-hat of all parameters is below
+            this value and their effective sample size is above
+            `ess_target`. If either target is `None`, the chains run
+            for the full number of steps.
+
+        ess_target : float or None
+            Target effective sample size.
+
+        seed : int, `np.random.SeedSequence`, or None
+            Root seed of the random streams of the chains.
+        """
+        self.sampler = MCMCSampler(
+            y,
+            sample_fn,
+            distance_fn,
+            n,
+            scale=scale,
+            gamma=gamma,
+            adaptive=adaptive,
+            target_acceptance=target_acceptance,
+        )
+        self.n_chains = n_chains
+        self.n_workers = n_workers
+        self.segment_length = segment_length
+        self.rhat_target = rhat_target
+        self.ess_target = ess_target
+
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+
+        self.seed = seed
+
+        self.rhat = None
+        self.ess = None
+        self.proposals = None
+
+    def _converged(self):
+        if self.rhat is None or None in (self.rhat_target, self.ess_target):
+            return False
+
+        return bool(
+            np.all(self.rhat < self.rhat_target)
+            and np.all(self.ess > self.ess_target)
+        )
+
+    def _diagnose(self, chains):
+        draws = np.array([
+            [r.theta for r in chain[len(chain) // 2:]] for chain in chains
+        ])
+
+        if draws.shape[1] >= 4:
+            self.rhat = split_rhat(draws)
+            self.ess = effective_sample_size(draws)
+
+    def __call__(self, n_samples, starts):
+        """Run the chains for at most a number of steps.
+
+        Parameters
+        ----------
+        n_samples : int
+            Maximum number of states of every chain.
+
+        starts : list of tuple
+            Initial parameters and sample of every chain. The starting
+            points should be dispersed, for instance by drawing them
+            from the prior.
+
+        Returns
+        -------
+        List of lists of `ABCResult`
+            The states of every chain. After the call, the diagnostics
+            of the last check are available as the `rhat` and `ess`
+            attributes, and the adaptive proposals of the chains, if
+            any, as the `proposals` attribute.
+        """
+        if len(starts) != self.n_chains:
+            raise ValueError(
+                f'Expected {self.n_chains} starting points, '
+                f'got {len(starts)}'
+            )
+
+        states = [(theta, X, None) for theta, X in starts]
+        rngs = [
+            np.random.default_rng(s) for s in self.seed.spawn(self.n_chains)
         ]
+        proposals = [
+            copy.deepcopy(self.sampler.proposal)
+            for _ in range(self.n_chains)
+        ]
+        chains = [[] for _ in range(self.n_chains)]
+
+        self.rhat = None
+        self.ess = None
+
+        executor = None
+        if self.n_workers != 1:
+            executor = ProcessPoolExecutor(
+                max_workers=self.n_workers or os.cpu_count(),
+                initializer=_init_chain_worker,
+                initargs=(self.sampler,),
+            )
+
+        progress = tqdm(total=n_samples, desc='MCMC')
+
+        try:
+            while len(chains[0]) < n_samples and not self._converged():
+                n_steps = min(self.segment_length, n_samples - len(chains[0]))
+
+                if executor is None:
+                    segments = [
+                        _run_chain_segment(self.sampler, n_steps, *chain)
+                        for chain in zip(states, rngs, proposals)
+                    ]
+                else:
+                    futures = [
+                        executor.submit(
+                            _run_chain_segment_in_worker,
+                            n_steps,
+                            *chain,
+                        )
+                        for chain in zip(states, rngs, proposals)
+                    ]
+                    segments = []
+                    for f in futures:
+                        segment, stats = f.result()
+                        merge_stats(stats)
+                        segments.append(segment)
+
+                for chain, segment in zip(chains, segments):
+                    chain.extend(segment[0])
+
+                _, states, rngs, proposals = map(list, zip(*segments))
+
+                self._diagnose(chains)
+
+                progress.update(n_steps)
+                if self.rhat is not None:
+                    progress.set_postfix(
+                        rhat=f'{np.max(self.rhat):.3f}',
+                        ess=f'{np.min(self.ess):.0f}',
+                    )
+        finally:
+            progress.close()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if self.sampler.proposal is not None:
+            self.proposals = proposals
 
-        return [
-            ABCResult(d, s[0], s[1])
-            for d, s in zip(distances, samples)
-        ]
\ No newline at end of file
+        return chains
@@ -0,0 +1,296 @@
+"""Content-addressed memoisation of simulations."""
+
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import uuid
+import weakref
+
+import numpy as np
+
+
+# Caches of this process by identifier, so that worker processes can
+# report their statistics to the process a cache was created in.
+_caches = weakref.WeakValueDictionary()
+
+
+def _reset_counts():
+    for cache in list(_caches.values()):
+        cache._reset_counts()
+
+
+# Forked workers inherit the counts of their parent, which are reset
+# so that they are not reported twice.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_counts)
+
+
+class SimulationCache:
+    """Size-bounded on-disk cache with least-recently-used eviction.
+
+    Every entry is stored as a pickle file named after its key. Access
+    times are tracked via the modification times of the files, so that
+    the least recently used entries are evicted first once the total
+    size of the cache exceeds its bound. Several processes may share a
+    cache directory; their statistics are kept separately, except that
+    the workers of the samplers report theirs to the process the cache
+    was created in via :func:`collect_stats` and :func:`merge_stats`.
+    """
+
+    def __init__(self, path, max_size=2**30):
+        """Open or create a cache.
+
+        Parameters
+        ----------
+        path : str
+            Directory of the cache.
+
+        max_size : int
+            Maximum total size of the entries in bytes.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.id = uuid.uuid4().hex
+        self._reset_counts()
+        _caches[self.id] = self
+
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+
+        # Estimated total size of the entries; the directory is only
+        # scanned once this estimate exceeds the bound.
+        self._size = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+        # Copies count their own lookups; see `collect_stats()`.
+        self._reset_counts()
+        _caches.setdefault(self.id, self)
+
+    def _reset_counts(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, f'{key}.pkl')
+
+    def get(self, key):
+        """Return the value stored under `key`, or `None`."""
+        path = self._entry_path(key)
+
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store `value` under `key` and evict old entries if needed."""
+        path = self._entry_path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            written = f.tell()
+        os.replace(tmp, path)
+
+        if self._size is None or self._size + written > self.max_size:
+            self._evict()
+        else:
+            self._size += written
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.path):
+                if not entry.name.endswith('.pkl'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            size = sum(e[1] for e in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+                self.evictions += 1
+
+            self._size = size
+
+    def stats(self):
+        """Return hit, miss, and eviction counts.
+
+        The counts cover the lookups of this process and those
+        reported by worker processes via :func:`merge_stats`.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def collect_stats():
+    """Collect and reset the counts of all caches of this process.
+
+    Returns
+    -------
+    dict
+        Mapping of cache identifiers to hit, miss, and eviction counts
+        since the last collection, for caches with any lookups.
+    """
+    stats = {}
+    for key, cache in list(_caches.items()):
+        counts = (cache.hits, cache.misses, cache.evictions)
+        if any(counts):
+            stats[key] = counts
+            cache._reset_counts()
+
+    return stats
+
+
+def merge_stats(stats):
+    """Add counts collected in another process to the caches of this one.
+
+    Parameters
+    ----------
+    stats : dict
+        Counts as returned by :func:`collect_stats`. Counts of caches
+        that do not exist in this process are ignored.
+    """
+    for key, (hits, misses, evictions) in stats.items():
+        cache = _caches.get(key)
+        if cache is not None:
+            cache.hits += hits
+            cache.misses += misses
+            cache.evictions += evictions
+
+
+def _code_version(fn):
+    """Return a hash of the source of the module defining `fn`."""
+    module = inspect.getmodule(fn)
+    try:
+        source = inspect.getsource(module if module is not None else fn)
+    except (OSError, TypeError):
+        # Without source, fall back to the compiled code if there is any.
+        code = getattr(fn, '__code__', None)
+        source = repr(None if code is None else code.co_code)
+
+    content = f'{np.__version__}\n{source}'
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class Memoized:
+    """Picklable memoising wrapper of a shape sampler.
+
+    Calls are keyed by a hash of the sampler, its code version, its
+    arguments, and the state of the random number generators it draws
+    from. The code version is a hash of the source of the module that
+    defines the sampler, together with the NumPy version, so that
+    entries are not reused once the sampler or a helper of it, and
+    thereby possibly its random stream, changes. After a call,
+    the resulting states of these generators are stored along with the
+    sample and restored upon a cache hit, so that subsequent random
+    draws do not depend on whether a sample came from the cache.
+    """
+
+    def __init__(self, sample_fn, cache, random_state=('seed', 'global')):
+        """Wrap a shape sampler.
+
+        Parameters
+        ----------
+        sample_fn : callable
+            Shape sampler, such as :func:`tabac.shapes.sample_from_sphere`.
+
+        cache : SimulationCache
+            Cache to use.
+
+        random_state : str or tuple of str
+            Sources of randomness of `sample_fn`: 'seed' for the
+            generator or seed passed as `seed` keyword argument, and
+            'global' for the global NumPy random state. Calls that draw
+            from an unseeded generator are not cached.
+        """
+        if isinstance(random_state, str):
+            random_state = (random_state,)
+
+        self.sample_fn = sample_fn
+        self.cache = cache
+        self.random_state = tuple(random_state)
+        self.version = _code_version(sample_fn)
+
+    def _key(self, args, kwargs, seed):
+        kwargs = {k: v for k, v in kwargs.items() if k != 'seed'}
+
+        content = [
+            self.sample_fn.__module__,
+            self.sample_fn.__qualname__,
+            self.version,
+            args,
+            sorted(kwargs.items()),
+        ]
+
+        if 'seed' in self.random_state:
+            if isinstance(seed, np.random.Generator):
+                content.append(seed.bit_generator.state)
+            else:
+                content.append(seed)
+
+        if 'global' in self.random_state:
+            content.append(np.random.get_state())
+
+        data = pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)
+        return hashlib.sha256(data).hexdigest()
+
+    def __call__(self, *args, **kwargs):
+        seed = kwargs.get('seed')
+
+        if 'seed' in self.random_state and seed is None:
+            return self.sample_fn(*args, **kwargs)
+
+        key = self._key(args, kwargs, seed)
+        entry = self.cache.get(key)
+
+        if entry is None:
+            sample = self.sample_fn(*args, **kwargs)
+            entry = (
+                sample,
+                seed.bit_generator.state
+                if isinstance(seed, np.random.Generator) else None,
+                np.random.get_state()
+                if 'global' in self.random_state else None,
+            )
+            self.cache.put(key, entry)
+            return sample
+
+        sample, seed_state, global_state = entry
+        if seed_state is not None:
+            seed.bit_generator.state = seed_state
+        if global_state is not None:
+            np.random.set_state(global_state)
+
+        return sample
@@ -1,41 +1,32 @@
 """Toy example experiment."""
 
+import time
+
+# Measure the startup time from the very first import on.
+_start = time.perf_counter()
+
 import argparse
+import sys
 
 import numpy as np
-import pandas as pd
 
-from scipy.stats import norm, multivariate_normal
-from helpers import importance_sampling_estimator
+from tabac.helpers import ImportanceSamplingEstimator
 
 from tabac.abc_functors import ImportanceSampler
 from tabac.abc_functors import RejectionSampler
 from tabac.abc_functors import MCMCSampler
+from tabac.abc_functors import MultiChainMCMCSampler
+from tabac.abc_functors import PriorSimulator
+from tabac.abc_functors import SMCSampler
 
-from tabac.distances import TopologicalDistance
-from tabac.distances import TopologicalDistanceCubical
-from tabac.distances import hausdorff_distance
-from tabac.distances import entropy_distance
-from tabac.distances import mse_distance
-from tabac.distances import rmse_distance
-from tabac.distances import ergas_distance
-from tabac.distances import scc_distance
-from tabac.distances import uqi_distance
-from tabac.distances import rase_distance
-from tabac.distances import vifp_distance
-from tabac.distances import mean_distance
-from tabac.distances import std_distance
-
-from tabac.shapes import sample_from_sphere
-from tabac.shapes import sample_from_torus
-from tabac.shapes import sample_from_percolation
-
-from vicsek_new import *
-
-from fluid import *
-
-import matplotlib.pyplot as plt
-import seaborn as sns
+from tabac.cache import Memoized
+from tabac.cache import SimulationCache
+from tabac.registry import DISTANCES
+from tabac.registry import SHAPES
+from tabac.registry import get_shape
+from tabac.registry import make_distance
+from tabac.store import SimulationStore
+from tabac.store import rescore
 
 
 if __name__ == "__main__":
@@ -51,13 +42,13 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--distance",
-        choices=["topological", "hausdorff","entropy","cubical","mse","uqi","rmse","ergas","scc","rase","vifp","mean","std"],
+        choices=DISTANCES,
         help="Select distance to use for simple rejection sampling",
     )
     parser.add_argument(
         "--shape",
         default="sphere",
-        choices=["sphere", "torus", "vicsek","perc","fluid"],
+        choices=list(SHAPES),
         help="Select type of shape to sample from",
     )
     parser.add_argument(
@@ -69,72 +60,276 @@ if __name__ == "__main__":
     parser.add_argument(
         "--sampler",
         default="importance",
-        choices=["importance", "rejection", "MCMC"],
+        choices=["importance", "rejection", "MCMC", "smc"],
         help="Select sampler",
     )
+    parser.add_argument(
+        "--batch-size",
+        default=None,
+        type=int,
+        help="Simulate samples in batches of this size",
+    )
+    parser.add_argument(
+        "--n-workers",
+        default=1,
+        type=int,
+        help="Number of processes for simulation and distance calculation",
+    )
+    parser.add_argument(
+        "--seed",
+        default=None,
+        type=int,
+        help="Root seed for the random streams of the simulations",
+    )
+    parser.add_argument(
+        "--epsilon",
+        default=None,
+        type=float,
+        help="Rejection threshold for rejection sampling",
+    )
+    parser.add_argument(
+        "--n-accept",
+        default=None,
+        type=int,
+        help="Stop rejection sampling after this many accepted samples",
+    )
+    parser.add_argument(
+        "--filtration",
+        default="rips",
+        choices=["rips", "sparse", "weak_alpha"],
+        help="Filtration for the topological distance",
+    )
+    parser.add_argument(
+        "--max-edge-length",
+        default="inf",
+        help="Maximum scale of the filtration, or 'auto' to derive it "
+             "from the observed data",
+    )
+    parser.add_argument(
+        "--collapse-edges",
+        action="store_true",
+        help="Collapse edges before computing Vietoris-Rips persistence",
+    )
+    parser.add_argument(
+        "--periodic",
+        action="store_true",
+        help="Use the periodic domain of the Vicsek model and the "
+             "periodic grid axes of images for distances",
+    )
+    parser.add_argument(
+        "--entropy-estimator",
+        default="kde",
+        choices=["kde", "tree", "binned", "knn"],
+        help="Estimator for the entropy distance",
+    )
+    parser.add_argument(
+        "--n-chains",
+        default=1,
+        type=int,
+        help="Number of MCMC chains; several chains are run until they "
+             "have converged, but for at most N steps",
+    )
+    parser.add_argument(
+        "--rhat-target",
+        default=1.01,
+        type=float,
+        help="Split-R-hat below which MCMC chains count as converged",
+    )
+    parser.add_argument(
+        "--ess-target",
+        default=400,
+        type=float,
+        help="Effective sample size at which MCMC chains are stopped",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adapt the MCMC proposal covariance to the chain history",
+    )
+    parser.add_argument(
+        "--target-acceptance",
+        default=None,
+        type=float,
+        help="Target acceptance rate of the adaptive MCMC proposal",
+    )
+    parser.add_argument(
+        "--n-generations",
+        default=10,
+        type=int,
+        help="Maximum number of SMC populations; N is the population "
+             "size, and --epsilon the final threshold",
+    )
+    parser.add_argument(
+        "--store",
+        default=None,
+        help="Directory of a simulation store to which simulated "
+             "samples are appended",
+    )
+    parser.add_argument(
+        "--rescore",
+        action="store_true",
+        help="Score the samples of the simulation store with the "
+             "selected distance instead of simulating new ones",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="Directory of a cache of simulations, keyed by parameters "
+             "and random state",
+    )
+    parser.add_argument(
+        "--cache-size",
+        default=1024,
+        type=float,
+        help="Maximum size of the simulation cache in MiB",
+    )
+    parser.add_argument(
+        "--no-plot",
+        action="store_true",
+        help="Only print the estimates; matplotlib and seaborn are not "
+             "imported",
+    )
 
     args = parser.parse_args()
 
+    if args.rescore and (
+        args.store is None or args.sampler not in ("importance", "rejection")
+    ):
+        parser.error(
+            "--rescore requires --store and the importance or rejection "
+            "sampler"
+        )
+
     n = args.n
     rng = np.random.default_rng(42)
 
-    sample_fn = sample_from_sphere
-    if args.shape == "torus":
-        sample_fn = sample_from_torus
-    elif args.shape == "perc":
-        sample_fn = sample_from_percolation
-    elif args.shape == "vicsek":
-        sample_fn = sample_from_vicsek
-    elif args.shape == "fluid":
-        sample_fn = sample_from_fluid
+    sample_fn, batch_sample_fn, random_state = get_shape(args.shape)
+
+    cache = None
+    if args.cache is not None:
+        cache = SimulationCache(args.cache, int(args.cache_size * 2**20))
+        sample_fn = Memoized(sample_fn, cache, random_state)
+        if batch_sample_fn is not None:
+            batch_sample_fn = Memoized(batch_sample_fn, cache, "seed")
 
     theta_true = args.theta
 
+    print(
+        f"Startup: {time.perf_counter() - _start:.2f} s to first simulation",
+        file=sys.stderr,
+    )
+
     y = sample_fn(n, *theta_true, seed=rng)
     std = .25
 
-    def _simulation_fn():
-        theta = [np.abs(norm.rvs(loc=t,scale=std)) for t in theta_true]
-        return theta, sample_fn(n, *theta, seed=rng)
-
-
-    distance_fn = TopologicalDistance()
-    if args.distance == "hausdorff":
-        distance_fn = hausdorff_distance
-    if args.distance == "entropy":
-        distance_fn = entropy_distance
-    if args.distance == "cubical":
-        distance_fn = TopologicalDistanceCubical()
-    if args.distance == "mse":
-        distance_fn = mse_distance
-    if args.distance == "uqi":
-        distance_fn = uqi_distance
-    if args.distance == "rmse":
-        distance_fn = rmse_distance
-    if args.distance == "ergas":
-        distance_fn = ergas_distance
-    if args.distance == "scc":
-        distance_fn = scc_distance
-    if args.distance == "rase":
-        distance_fn = rase_distance
-    if args.distance == "vifp":
-        distance_fn = vifp_distance
-    if args.distance == "mean":
-        distance_fn = mean_distance
-    if args.distance == "std":
-        distance_fn = std_distance
-
-    if args.sampler =="MCMC":
-        theta_0, X_0 = _simulation_fn()
-        sampler = MCMCSampler(y, sample_fn, distance_fn, args.n)
+    simulation_fn = PriorSimulator(
+        sample_fn,
+        theta_true,
+        n,
+        scale=std,
+        batch_sample_fn=batch_sample_fn,
+        seed=rng,
+    )
+
+    max_edge_length = args.max_edge_length
+    if max_edge_length != "auto":
+        max_edge_length = float(max_edge_length)
+
+    distance_fn = make_distance(
+        args.distance or "topological",
+        shape=args.shape,
+        n=n,
+        periodic=args.periodic,
+        filtration=args.filtration,
+        max_edge_length=max_edge_length,
+        collapse_edges=args.collapse_edges,
+        entropy_estimator=args.entropy_estimator,
+    )
+
+    store = None
+    if args.store is not None:
+        try:
+            store = SimulationStore(
+                args.store,
+                args.shape,
+                n,
+                prior={"theta": theta_true, "scale": std},
+            )
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.rescore:
+        results = rescore(store, y, distance_fn)
+        if args.sampler == "rejection" and args.epsilon is not None:
+            results = [r for r in results if r.distance <= args.epsilon]
+    elif args.sampler == "MCMC" and args.n_chains > 1:
+        # Draw dispersed starting points from the prior.
+        starts = [simulation_fn() for _ in range(args.n_chains)]
+        sampler = MultiChainMCMCSampler(
+            y,
+            sample_fn,
+            distance_fn,
+            args.n,
+            n_chains=args.n_chains,
+            n_workers=args.n_workers,
+            rhat_target=args.rhat_target,
+            ess_target=args.ess_target,
+            adaptive=args.adaptive,
+            target_acceptance=args.target_acceptance,
+            seed=args.seed,
+        )
+        chains = sampler(args.N, starts)
+        print(f"Split-R-hat: {sampler.rhat}, ESS: {sampler.ess}")
+
+        # Discard the first half of every chain as warm-up.
+        results = [r for chain in chains for r in chain[len(chain) // 2:]]
+    elif args.sampler =="MCMC":
+        theta_0, X_0 = simulation_fn()
+        sampler = MCMCSampler(
+            y,
+            sample_fn,
+            distance_fn,
+            args.n,
+            adaptive=args.adaptive,
+            target_acceptance=args.target_acceptance,
+            seed=args.seed,
+        )
         results = sampler(args.N, theta_0, X_0)
     else:
-        Sampler = (
-            ImportanceSampler if args.sampler == "importance" else RejectionSampler
+        kwargs = dict(
+            batch_size=args.batch_size,
+            n_workers=args.n_workers,
+            seed=args.seed,
+            store=store,
         )
-        sampler = Sampler(y, _simulation_fn, distance_fn=distance_fn)
-        results = sampler(args.N)
-
+        if args.sampler == "importance":
+            sampler = ImportanceSampler(
+                y, simulation_fn, distance_fn=distance_fn, **kwargs
+            )
+            results = sampler(args.N)
+        elif args.sampler == "smc":
+            sampler = SMCSampler(
+                y,
+                simulation_fn,
+                distance_fn=distance_fn,
+                n_generations=args.n_generations,
+                epsilon=args.epsilon,
+                **kwargs,
+            )
+            results = sampler(args.N)
+            print(
+                f"SMC thresholds: {sampler.epsilons}, "
+                f"simulations: {sampler.n_simulations}"
+            )
+        else:
+            sampler = RejectionSampler(
+                y,
+                simulation_fn,
+                distance_fn=distance_fn,
+                epsilon=args.epsilon,
+                **kwargs,
+            )
+            results = sampler(args.N, n_accept=args.n_accept)
 
     distances = []
 
@@ -153,14 +348,34 @@ if __name__ == "__main__":
     if args.sampler == "MCMC":
         mcmc_estimate = np.mean(np.array([res.theta for res in results]),axis=0)
         print(f"MCMC estimator: {mcmc_estimate}")
+    elif args.sampler == "smc":
+        thetas = np.array([res.theta for res in results])
+        smc_estimate = sampler.weights @ thetas
+        print(f"SMC estimator: {smc_estimate}")
     else:
-        importance_sampling_estimate = importance_sampling_estimator(results=results, theta_true=theta_true, std=std)
-        print(f"Importance Sampling estimator: {importance_sampling_estimate}")
+        estimator = ImportanceSamplingEstimator(theta_true, std=std)
+        estimator.update_results(results)
+        print(f"Importance Sampling estimator: {estimator.estimate}")
+        print(f"Effective sample size: {estimator.ess}")
+
+    if cache is not None:
+        print(f"Simulation cache: {cache.stats()}")
 
     ################################################
     # Plots
     ################################################
 
+    if args.no_plot:
+        sys.exit()
+
+    if not results:
+        print("No samples to plot.")
+        sys.exit()
+
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
     df = pd.DataFrame.from_records(distances)
     thetas = np.array([np.array(x) for x in df.theta.to_numpy()])
 
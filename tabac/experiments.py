@@ -0,0 +1,636 @@
+"""In-process runner for batches of ABC experiments."""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+import traceback
+
+from collections import defaultdict
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+
+from tqdm import tqdm
+import numpy as np
+
+from tabac.abc_functors import ImportanceSampler
+from tabac.abc_functors import MCMCSampler
+from tabac.abc_functors import PriorSimulator
+from tabac.abc_functors import RejectionSampler
+from tabac.abc_functors import SMCSampler
+from tabac.helpers import importance_sampling_estimator
+from tabac.registry import get_shape
+from tabac.registry import make_distance
+
+
+DEFAULTS = {
+    'n': 100,
+    'N': 250,
+    'sampler': 'importance',
+    'distance': 'topological',
+    'seed': None,
+    'observation_seed': 42,
+    'std': 0.25,
+}
+
+
+class ExperimentResult(namedtuple(
+        'ExperimentResult',
+        [
+            'config',
+            'estimate',
+            'error',
+            'duration',
+        ],
+    )
+):
+    """Experiment result storage class.
+
+    The estimate is `None` and the error holds the formatted traceback
+    if the experiment failed.
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """Return whether the experiment succeeded."""
+        return self.error is None
+
+
+def run_experiment(config):
+    """Run a single experiment and return its point estimate.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration of the experiment. The keys 'shape' and 'theta'
+        are required; all others default to the values in `DEFAULTS`:
+
+        - 'n': number of points for each sample
+        - 'N': number of simulations
+        - 'sampler': 'importance', 'rejection', 'MCMC', or 'smc'
+        - 'distance': name of the distance; see
+          :func:`tabac.registry.make_distance`
+        - 'seed': root seed of the simulations
+        - 'observation_seed': seed of the observed sample
+        - 'std': standard deviation of the parameter distribution
+
+    Returns
+    -------
+    np.array
+        Point estimate of the parameters.
+    """
+    config = {**DEFAULTS, **config}
+
+    theta_true = [float(t) for t in config['theta']]
+    n = config['n']
+    std = config['std']
+
+    sample_fn, batch_sample_fn, _ = get_shape(config['shape'])
+    distance_fn = make_distance(config['distance'], config['shape'], n)
+
+    # Shapes drawing from the global random state get a fixed
+    # observation as well.
+    np.random.seed(config['observation_seed'])
+    y = sample_fn(
+        n,
+        *theta_true,
+        seed=np.random.default_rng(config['observation_seed']),
+    )
+
+    prior_seed = seed = None
+    if config['seed'] is not None:
+        prior_seed, seed, global_seed = np.random.SeedSequence(
+            config['seed']
+        ).spawn(3)
+    else:
+        global_seed = np.random.SeedSequence()
+
+    # Reseed the global random state from the experiment seed, so that
+    # repetitions of shapes drawing from it do not share the noise of
+    # their simulations.
+    np.random.seed(global_seed.generate_state(1))
+
+    simulation_fn = PriorSimulator(
+        sample_fn,
+        theta_true,
+        n,
+        scale=std,
+        batch_sample_fn=batch_sample_fn,
+        seed=prior_seed,
+    )
+
+    sampler = config['sampler']
+
+    if sampler == 'MCMC':
+        theta_0, X_0 = simulation_fn()
+        mcmc = MCMCSampler(y, sample_fn, distance_fn, n, seed=seed)
+        results = mcmc(config['N'], theta_0, X_0)
+        return np.mean([r.theta for r in results], axis=0)
+
+    if sampler == 'smc':
+        smc = SMCSampler(y, simulation_fn, distance_fn, seed=seed)
+        results = smc(config['N'])
+        return smc.weights @ np.array([r.theta for r in results])
+
+    if sampler == 'importance':
+        Sampler = ImportanceSampler
+    elif sampler == 'rejection':
+        Sampler = RejectionSampler
+    else:
+        raise ValueError(f'Unknown sampler: {sampler}')
+
+    results = Sampler(y, simulation_fn, distance_fn, seed=seed)(config['N'])
+    return importance_sampling_estimator(results, theta_true, std=std)
+
+
+def _run_task(config):
+    # Workers forked from the same process share their random state, so
+    # unseeded experiments receive fresh entropy, which is recorded.
+    if config.get('seed') is None:
+        config = {**config, 'seed': np.random.SeedSequence().entropy}
+
+    start = time.perf_counter()
+    try:
+        estimate = run_experiment(config)
+        error = None
+    except Exception:
+        estimate = None
+        error = traceback.format_exc()
+
+    return ExperimentResult(
+        config, estimate, error, time.perf_counter() - start
+    )
+
+
+def _iter_results(configs, n_workers=None):
+    # Yield indices and results of the experiments as they finish. The
+    # pool starts experiments in the order of `configs`.
+    progress = tqdm(total=len(configs), desc='Experiments')
+
+    if n_workers == 1:
+        tasks = ((i, _run_task(config)) for i, config in enumerate(configs))
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=n_workers or os.cpu_count())
+        futures = {
+            executor.submit(_run_task, config): i
+            for i, config in enumerate(configs)
+        }
+        tasks = ((futures[f], f.result()) for f in as_completed(futures))
+
+    try:
+        for i, result in tasks:
+            if not result.ok:
+                progress.write(
+                    f'Experiment {result.config} failed:\n{result.error}',
+                    file=sys.stderr,
+                )
+            progress.update()
+            yield i, result
+    finally:
+        progress.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def run_experiments(configs, n_workers=None):
+    """Run experiments in a pool of worker processes.
+
+    Parameters
+    ----------
+    configs : list of dict
+        Configurations of the experiments; see :func:`run_experiment`.
+
+    n_workers : int or None
+        Number of worker processes. If set to `None`, all available
+        cores will be used. If set to 1, the experiments are run in
+        the current process.
+
+    Returns
+    -------
+    List of `ExperimentResult`
+        Results in the order of `configs`. The configuration of every
+        result records the seed it was run with. Failed experiments
+        are reported on stderr and have an estimate of `None`.
+    """
+    configs = list(configs)
+    results = [None] * len(configs)
+
+    for i, result in _iter_results(configs, n_workers):
+        results[i] = result
+
+    return results
+
+
+def experiment_grid(base, groups, thetas, n_repeats):
+    """Create configurations for a grid of experiments.
+
+    Parameters
+    ----------
+    base : dict
+        Configuration shared by all experiments.
+
+    groups : dict
+        Mapping of group labels to configurations that are specific
+        to a group, such as sampler and distance.
+
+    thetas : list
+        Parameters of the experiments of every group.
+
+    n_repeats : int
+        Number of repetitions of every experiment.
+
+    Returns
+    -------
+    list of dict
+        Configurations ordered by group, parameters, and repetition.
+    """
+    return [
+        {**base, **group, 'theta': list(np.atleast_1d(theta))}
+        for group in groups.values()
+        for theta in thetas
+        for _ in range(n_repeats)
+    ]
+
+
+def estimate_table(results, groups, thetas, n_repeats, index=0):
+    """Arrange estimates of a grid of experiments by group.
+
+    Parameters
+    ----------
+    results : list of `ExperimentResult`
+        Results of the configurations of :func:`experiment_grid`.
+
+    groups, thetas, n_repeats
+        See :func:`experiment_grid`.
+
+    index : int or None
+        Index of the parameter whose estimate is reported. If set to
+        `None`, all parameters are reported.
+
+    Returns
+    -------
+    dict
+        Mapping of group labels to lists of estimates per parameter
+        and repetition. Failed experiments are reported as `np.nan`.
+    """
+    def _value(result):
+        if not result.ok:
+            return np.nan
+        if index is None:
+            return list(result.estimate)
+        return float(result.estimate[index])
+
+    values = [_value(result) for result in results]
+    size = len(thetas) * n_repeats
+
+    return {
+        label: [
+            values[
+                g * size + i * n_repeats:g * size + (i + 1) * n_repeats
+            ]
+            for i in range(len(thetas))
+        ]
+        for g, label in enumerate(groups)
+    }
+
+
+class GridTask(namedtuple(
+        'GridTask',
+        [
+            'key',
+            'label',
+            'config',
+        ],
+    )
+):
+    """Experiment of a grid, identified by a hash of its contents."""
+
+    __slots__ = ()
+
+
+# Rough relative costs of simulating a sample of a shape and of
+# evaluating a distance, used to schedule experiments whose durations
+# have not been logged yet.
+_SHAPE_COST = {
+    'sphere': 1,
+    'torus': 1,
+    'perc': 20,
+    'vicsek': 50,
+    'fluid': 200,
+}
+
+_DISTANCE_COST = {
+    'topological': 10,
+    'cubical': 10,
+    'hausdorff': 3,
+    'entropy': 3,
+}
+
+
+def _to_json(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'Cannot serialise {type(obj).__name__}')
+
+
+def load_grid(path):
+    """Load the specification of a grid of experiments.
+
+    Specifications are JSON or TOML files with the following keys:
+
+    - 'groups': mapping of group labels to configurations; see
+      :func:`experiment_grid`
+    - 'thetas': parameters of the experiments of every group
+    - 'base': configuration shared by all experiments (optional)
+    - 'repeats': number of repetitions (optional, defaults to 1)
+    - 'seed': root seed of the grid (optional); every experiment is
+      seeded with its group label, parameters, and repetition
+    - 'output': path of the pickled table of estimates (optional)
+    - 'log': path of the results log (optional); defaults to the
+      output path with a `.jsonl` suffix
+    - 'all_parameters': if set, the estimates of all parameters are
+      tabulated instead of only the first one (optional)
+
+    Parameters
+    ----------
+    path : str
+        Path of the specification; files ending in `.toml` are parsed
+        as TOML, all others as JSON.
+
+    Returns
+    -------
+    dict
+        Specification of the grid.
+    """
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ModuleNotFoundError:  # Python < 3.11
+            import tomli as tomllib
+
+        with open(path, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        with open(path) as f:
+            spec = json.load(f)
+
+    for key in ('groups', 'thetas'):
+        if key not in spec:
+            raise ValueError(f'Grid specification {path} lacks {key!r}')
+    if 'log' not in spec and 'output' not in spec:
+        raise ValueError(
+            f'Grid specification {path} requires a log or output path'
+        )
+
+    return spec
+
+
+def grid_tasks(spec):
+    """Expand the specification of a grid into experiments.
+
+    Parameters
+    ----------
+    spec : dict
+        Specification of the grid; see :func:`load_grid`.
+
+    Returns
+    -------
+    list of `GridTask`
+        Experiments ordered by group, parameters, and repetition, as
+        in :func:`experiment_grid`. Their keys and seeds only depend
+        on group label, configuration, and repetition, so that they
+        remain valid if the grid is reordered or extended.
+    """
+    base = spec.get('base', {})
+    n_repeats = spec.get('repeats', 1)
+    seed = spec.get('seed')
+
+    tasks = []
+    for label, group in spec['groups'].items():
+        for theta in spec['thetas']:
+            theta = np.atleast_1d(theta).tolist()
+
+            # Seeds are derived from the content rather than the
+            # position of an experiment, which changes as the grid is
+            # edited.
+            content = json.dumps([label, [float(t) for t in theta]])
+            digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+
+            for r in range(n_repeats):
+                config = {**base, **group, 'theta': theta}
+                if seed is not None:
+                    config['seed'] = [seed, int(digest, 16), r]
+
+                content = json.dumps(
+                    [label, config, r], sort_keys=True, default=_to_json
+                )
+                key = hashlib.sha256(content.encode()).hexdigest()[:16]
+                tasks.append(GridTask(key, label, config))
+
+    return tasks
+
+
+def read_log(path):
+    """Read a results log.
+
+    Parameters
+    ----------
+    path : str
+        Path of the log, with one JSON record per line. A missing log
+        is treated as empty, and a truncated last line, as left behind
+        by an interrupted run, is ignored.
+
+    Returns
+    -------
+    dict
+        Mapping of task keys to their most recent records.
+    """
+    records = {}
+    if not os.path.exists(path):
+        return records
+
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record['key']] = record
+
+    return records
+
+
+def _cost_key(config):
+    config = {**DEFAULTS, **config}
+    return (
+        config['shape'], config['n'], config['sampler'], config['distance']
+    )
+
+
+def _heuristic_cost(config):
+    config = {**DEFAULTS, **config}
+    return (
+        config['N']
+        * _SHAPE_COST.get(config['shape'], 1)
+        * _DISTANCE_COST.get(config['distance'], 1)
+    )
+
+
+def expected_costs(configs, records=()):
+    """Estimate the durations of experiments.
+
+    Experiments whose shape, size, sampler, and distance match logged
+    experiments are expected to take as long per simulation as those.
+    All others are estimated from rough relative costs of shapes and
+    distances, scaled to the logged durations if there are any.
+
+    Parameters
+    ----------
+    configs : list of dict
+        Configurations of the experiments.
+
+    records : iterable of dict
+        Records of finished experiments; see :func:`read_log`.
+
+    Returns
+    -------
+    list of float
+        Expected durations of the experiments.
+    """
+    per_simulation = defaultdict(list)
+    ratios = []
+
+    for record in records:
+        if record['error'] is not None:
+            continue
+        config = {**DEFAULTS, **record['config']}
+        per_simulation[_cost_key(config)].append(
+            record['duration'] / config['N']
+        )
+        ratios.append(record['duration'] / _heuristic_cost(config))
+
+    scale = np.median(ratios) if ratios else 1.0
+
+    costs = []
+    for config in configs:
+        durations = per_simulation.get(_cost_key(config))
+        if durations:
+            N = {**DEFAULTS, **config}['N']
+            costs.append(N * np.mean(durations))
+        else:
+            costs.append(scale * _heuristic_cost(config))
+
+    return costs
+
+
+def run_grid(spec, n_workers=None):
+    """Run a grid of experiments, resuming from its results log.
+
+    Every finished experiment is appended to the results log right
+    away, so that an interrupted grid can be resumed by running it
+    again; experiments that succeeded before are skipped, while failed
+    ones are retried. The remaining experiments are started in order
+    of decreasing expected duration, so that long experiments do not
+    delay the end of the grid.
+
+    Parameters
+    ----------
+    spec : dict
+        Specification of the grid; see :func:`load_grid`.
+
+    n_workers : int or None
+        Number of worker processes; see :func:`run_experiments`.
+
+    Returns
+    -------
+    dict
+        Table of estimates; see :func:`estimate_table`. It is also
+        pickled to the output path of the grid, if there is one.
+    """
+    tasks = grid_tasks(spec)
+    log_path = spec.get('log')
+    if log_path is None:
+        log_path = os.path.splitext(spec['output'])[0] + '.jsonl'
+
+    records = read_log(log_path)
+    pending = [
+        task for task in tasks
+        if records.get(task.key, {}).get('error', '') is not None
+    ]
+
+    costs = expected_costs(
+        [task.config for task in pending], records.values()
+    )
+    order = np.argsort(costs, kind='stable')[::-1]
+    pending = [pending[i] for i in order]
+
+    if pending:
+        with open(log_path, 'a+b') as log:
+            # Terminate a record truncated by an interrupted run.
+            if log.seek(0, os.SEEK_END) > 0:
+                log.seek(-1, os.SEEK_END)
+                if log.read(1) != b'\n':
+                    log.write(b'\n')
+
+            results = _iter_results(
+                [task.config for task in pending], n_workers
+            )
+            for i, result in results:
+                record = {
+                    'key': pending[i].key,
+                    'label': pending[i].label,
+                    **result._asdict(),
+                }
+                line = json.dumps(record, default=_to_json) + '\n'
+                log.write(line.encode())
+                log.flush()
+                os.fsync(log.fileno())
+                records[record['key']] = record
+
+    results = [
+        ExperimentResult(**{
+            k: v for k, v in records[task.key].items()
+            if k in ExperimentResult._fields
+        })
+        for task in tasks
+    ]
+
+    table = estimate_table(
+        results,
+        spec['groups'],
+        spec['thetas'],
+        spec.get('repeats', 1),
+        index=None if spec.get('all_parameters') else 0,
+    )
+
+    if 'output' in spec:
+        with open(spec['output'], 'wb') as f:
+            pickle.dump(table, f)
+
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run a grid of experiments from a specification.'
+    )
+    parser.add_argument(
+        'spec', help='Path of the grid specification (JSON or TOML)'
+    )
+    parser.add_argument(
+        '--n-workers',
+        type=int,
+        help='Number of worker processes (default: all cores)',
+    )
+
+    args = parser.parse_args()
+    run_grid(load_grid(args.spec), args.n_workers)
@@ -2,40 +2,8 @@
 
 import argparse
 
-import numpy as np
-import pandas as pd
-
-from scipy.stats import norm, multivariate_normal
-from helpers import importance_sampling_estimator
-
-from tabac.abc_functors import ImportanceSampler
-from tabac.abc_functors import RejectionSampler
-from tabac.abc_functors import MCMCSampler
-
-from tabac.distances import TopologicalDistance
-from tabac.distances import TopologicalDistanceCubical
-from tabac.distances import hausdorff_distance
-from tabac.distances import entropy_distance
-from tabac.distances import mse_distance
-from tabac.distances import rmse_distance
-from tabac.distances import ergas_distance
-from tabac.distances import scc_distance
-from tabac.distances import uqi_distance
-from tabac.distances import rase_distance
-from tabac.distances import vifp_distance
-from tabac.distances import mean_distance
-from tabac.distances import std_distance
-
-from tabac.shapes import sample_from_sphere
-from tabac.shapes import sample_from_torus
-from tabac.shapes import sample_from_percolation
-
-from vicsek_new import *
-
-from fluid import *
-
-import matplotlib.pyplot as plt
-import seaborn as sns
+from tabac.experiments import run_experiment
+from tabac.registry import DISTANCES
 
 
 if __name__ == "__main__":
@@ -51,13 +19,13 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--distance",
-        choices=["topological", "hausdorff","entropy","cubical","mse","uqi","rmse","ergas","scc","rase","vifp","mean","std"],
+        choices=DISTANCES,
         help="Select distance to use for simple rejection sampling",
     )
     parser.add_argument(
         "--shape",
         default="sphere",
-        choices=["sphere", "torus", "vicsek","perc","fluid"],
+        choices=["sphere", "torus", "vicsek", "perc", "fluid"],
         help="Select type of shape to sample from",
     )
     parser.add_argument(
@@ -75,84 +43,19 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    n = args.n
-    rng = np.random.default_rng(42)
-
-    sample_fn = sample_from_sphere
-    if args.shape == "torus":
-        sample_fn = sample_from_torus
-    elif args.shape == "perc":
-        sample_fn = sample_from_percolation
-    elif args.shape == "vicsek":
-        sample_fn = sample_from_vicsek
-    elif args.shape == "fluid":
-        sample_fn = sample_from_fluid
-
-    theta_true = args.theta
-
-    y = sample_fn(n, *theta_true, seed=rng)
-    std = .25
-
-    def _simulation_fn():
-        theta = [np.abs(norm.rvs(loc=t,scale=std)) for t in theta_true]
-        return theta, sample_fn(n, *theta, seed=rng)
-
-
-    distance_fn = TopologicalDistance()
-    if args.distance == "hausdorff":
-        distance_fn = hausdorff_distance
-    if args.distance == "entropy":
-        distance_fn = entropy_distance
-    if args.distance == "cubical":
-        distance_fn = TopologicalDistanceCubical()
-    if args.distance == "mse":
-        distance_fn = mse_distance
-    if args.distance == "uqi":
-        distance_fn = uqi_distance
-    if args.distance == "rmse":
-        distance_fn = rmse_distance
-    if args.distance == "ergas":
-        distance_fn = ergas_distance
-    if args.distance == "scc":
-        distance_fn = scc_distance
-    if args.distance == "rase":
-        distance_fn = rase_distance
-    if args.distance == "vifp":
-        distance_fn = vifp_distance
-    if args.distance == "mean":
-        distance_fn = mean_distance
-    if args.distance == "std":
-        distance_fn = std_distance
-
-    if args.sampler =="MCMC":
-        theta_0, X_0 = _simulation_fn()
-        sampler = MCMCSampler(y, sample_fn, distance_fn, args.n)
-        results = sampler(args.N, theta_0, X_0)
-    else:
-        Sampler = (
-            ImportanceSampler if args.sampler == "importance" else RejectionSampler
-        )
-        sampler = Sampler(y, _simulation_fn, distance_fn=distance_fn)
-        results = sampler(args.N)
-
-
-    distances = []
-
-    for result in results:
-        distances.append(
-            {
-                "theta": result.theta,
-                "distance": result.distance,
-            }
-        )
+    estimate = run_experiment(
+        {
+            "shape": args.shape,
+            "theta": args.theta,
+            "n": args.n,
+            "N": args.N,
+            "sampler": args.sampler,
+            "distance": args.distance or "topological",
+        }
+    )
 
     ################################################
     # Point estimator
     ################################################
 
-    if args.sampler == "MCMC":
-        mcmc_estimate = np.mean(np.array([res.theta for res in results]),axis=0)
-        print(mcmc_estimate[0])
-    else:
-        importance_sampling_estimate = importance_sampling_estimator(results=results, theta_true=theta_true, std=std)
-        print(importance_sampling_estimate[0])
+    print(estimate[0])
@@ -1,5 +1,7 @@
 import numpy as np
 
+from tabac.shapes import ImageSample
+
 def euc_distance(x1, y1, x2, y2):
     return np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
@@ -53,4 +55,7 @@ def sample_from_fluid(n,eta,*args, **kwargs):
         F = F + -(1 / tau) * (F - Feq)
     res = ux ** 2 + uy ** 2
     res = np.nan_to_num(res,nan=np.nanmean(res),posinf=100000,neginf=-100000)
-    return np.sqrt(res)
\ No newline at end of file
+
+    # The flow wraps around vertically, while the left and right
+    # boundaries are open.
+    return ImageSample(np.sqrt(res), periodic=(True, False))
\ No newline at end of file
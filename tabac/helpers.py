@@ -1,12 +1,201 @@
 import numpy as np
-from scipy.stats import norm
+
+
+def normal_logpdf(x, loc=0.0, scale=1.0):
+    """Evaluate the log-density of a normal distribution.
+
+    Equivalent to ``scipy.stats.norm.logpdf``, which is avoided here
+    because importing `scipy.stats` takes most of a second.
+    """
+    z = (np.asarray(x, dtype=float) - loc) / scale
+    return -0.5 * z**2 - np.log(scale) - 0.5 * np.log(2 * np.pi)
+
+
+class ImportanceSamplingEstimator:
+    """Online importance sampling estimator of the parameters.
+
+    Every simulated parameter vector is weighted by the pseudo-likelihood
+    ``exp(-gamma * distance)`` of its sample times the density of the
+    sampling distribution, separately for every parameter. All sums are
+    kept in log-space relative to a running maximum, so the estimate is
+    stable for any scale of distances. Results can be added chunk by
+    chunk via :meth:`update`.
+    """
+
+    def __init__(self, theta_true, gamma=10, std=.25):
+        """Create new estimator.
+
+        Parameters
+        ----------
+        theta_true : array_like
+            Location of the parameter distribution.
+
+        gamma : float
+            Inverse temperature of the pseudo-likelihood.
+
+        std : float
+            Standard deviation of the parameter distribution.
+        """
+        self.theta_true = np.asarray(theta_true, dtype=float)
+        self.gamma = gamma
+        self.std = std
+
+        self._max = np.full(self.theta_true.shape, -np.inf)
+        self._sum = np.zeros(self.theta_true.shape)
+        self._sum_sq = np.zeros(self.theta_true.shape)
+        self._sum_theta = np.zeros(self.theta_true.shape)
+
+    def update(self, distances, thetas):
+        """Add a chunk of results.
+
+        Parameters
+        ----------
+        distances : array_like
+            Distances of shape `(m,)`.
+
+        thetas : array_like
+            Parameters of shape `(m, k)`.
+        """
+        distances = np.asarray(distances, dtype=float)
+        if len(distances) == 0:
+            return
+        thetas = np.asarray(thetas, dtype=float).reshape(len(distances), -1)
+
+        log_w = -self.gamma * distances[:, None] + normal_logpdf(
+            thetas, loc=self.theta_true, scale=self.std
+        )
+
+        new_max = np.maximum(self._max, log_w.max(axis=0))
+        finite = np.isfinite(new_max)
+        shift = np.where(finite, new_max, 0.0)
+
+        # Rescale the sums of previous chunks to the new maximum.
+        with np.errstate(invalid='ignore'):
+            old = np.where(
+                np.isfinite(self._max), np.exp(self._max - shift), 0.0
+            )
+
+        w = np.exp(log_w - shift)
+        self._sum = self._sum * old + w.sum(axis=0)
+        self._sum_sq = self._sum_sq * old**2 + (w**2).sum(axis=0)
+        self._sum_theta = self._sum_theta * old + (w * thetas).sum(axis=0)
+        self._max = new_max
+
+    def update_results(self, results):
+        """Add a chunk of `ABCResult` records."""
+        results = list(results)
+        self.update(
+            [r.distance for r in results],
+            [np.ravel(r.theta) for r in results],
+        )
+
+    @property
+    def estimate(self):
+        """Return the weighted mean of every parameter."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._sum_theta / self._sum
+
+    @property
+    def ess(self):
+        """Return the effective sample size of every parameter."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._sum**2 / self._sum_sq
+
 
 def importance_sampling_estimator(results, theta_true, gamma=10, std=.25):
-    numerator = 0.0
-    denominator = 0.0
-    for result in results:
-        theta, dist = result.theta, result.distance
-        numerator += np.array(theta) * np.exp(-gamma * dist) * norm.pdf(theta, loc=theta_true, scale=std) * 200
-        denominator += np.exp(-gamma * dist) * norm.pdf(theta, loc=theta_true, scale=std) * 200
-        theta_pred = numerator / denominator
-    return theta_pred
\ No newline at end of file
+    estimator = ImportanceSamplingEstimator(theta_true, gamma, std)
+    estimator.update_results(results)
+    return estimator.estimate
+
+def _split_chains(draws):
+    """Split chains into halves and move parameters to the last axis."""
+    draws = np.asarray(draws, dtype=float)
+    if draws.ndim == 2:
+        draws = draws[..., None]
+
+    half = draws.shape[1] // 2
+    return np.concatenate([draws[:, :half], draws[:, -half:]], axis=0)
+
+
+def _variances(draws):
+    """Calculate within-chain and pooled variance estimates."""
+    n = draws.shape[1]
+    within = draws.var(axis=1, ddof=1).mean(axis=0)
+    between = draws.mean(axis=1).var(axis=0, ddof=1)
+    return within, (n - 1) / n * within + between
+
+
+def split_rhat(draws):
+    """Calculate the split-R-hat convergence diagnostic.
+
+    Parameters
+    ----------
+    draws : array_like
+        Draws of shape `(m, n)` or `(m, n, p)`, where `m` is the number
+        of chains, `n` the number of draws per chain, and `p` the
+        number of parameters. At least four draws per chain are needed.
+
+    Returns
+    -------
+    np.array
+        Potential scale reduction factor of every parameter. Values
+        close to 1 indicate that the chains have mixed; chains that
+        are stuck result in `np.inf` or `np.nan`.
+    """
+    draws = _split_chains(draws)
+    within, pooled = _variances(draws)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(pooled / within)
+
+
+def _autocovariance(x):
+    """Calculate autocovariances of every chain along the second axis."""
+    m, n, p = x.shape
+    x = x - x.mean(axis=1, keepdims=True)
+    size = 2 ** int(np.ceil(np.log2(2 * n)))
+    f = np.fft.rfft(x, n=size, axis=1)
+    return np.fft.irfft(f * np.conj(f), n=size, axis=1)[:, :n] / n
+
+
+def effective_sample_size(draws):
+    """Calculate the effective sample size of multiple chains.
+
+    The autocorrelations of the split chains are combined as in
+    Gelman et al., *Bayesian Data Analysis*, and truncated using
+    Geyer's initial monotone sequence estimator.
+
+    Parameters
+    ----------
+    draws : array_like
+        Draws of shape `(m, n)` or `(m, n, p)`; see :func:`split_rhat`.
+
+    Returns
+    -------
+    np.array
+        Effective sample size of every parameter.
+    """
+    draws = _split_chains(draws)
+    m, n, p = draws.shape
+    within, pooled = _variances(draws)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = 1 - (within - _autocovariance(draws).mean(axis=0)) / pooled
+
+    ess = np.zeros(p)
+    for j in range(p):
+        if not np.isfinite(rho[0, j]):
+            continue
+
+        # Sums of pairs of consecutive autocorrelations, truncated at
+        # the first negative pair and made monotone.
+        pairs = rho[:2 * (n // 2), j].reshape(-1, 2).sum(axis=1)
+        negative = np.flatnonzero(pairs < 0)
+        if len(negative) > 0:
+            pairs = pairs[:negative[0]]
+
+        pairs = np.minimum.accumulate(pairs)
+        tau = -1 + 2 * pairs.sum()
+        ess[j] = m * n / max(tau, 1 / np.log10(m * n))
+
+    return ess
@@ -0,0 +1,144 @@
+"""Registry of shape samplers and distances for experiments."""
+
+import importlib
+
+import numpy as np
+
+
+# Shape samplers and their batched variants, given as module and
+# function names so that a shape's dependencies are only imported once
+# it is selected, and the source of their randomness: 'seed' if they
+# draw from the supplied generator, and 'global' if they draw from the
+# global NumPy random state.
+SHAPES = {
+    'sphere': (
+        'tabac.shapes', 'sample_from_sphere', 'sample_from_sphere_batch',
+        'seed',
+    ),
+    'torus': (
+        'tabac.shapes', 'sample_from_torus', 'sample_from_torus_batch',
+        'seed',
+    ),
+    'perc': (
+        'tabac.shapes',
+        'sample_from_percolation',
+        'sample_from_percolation_batch',
+        'seed',
+    ),
+    'vicsek': ('tabac.vicsek_new', 'sample_from_vicsek', None, 'global'),
+    'fluid': ('tabac.fluid', 'sample_from_fluid', None, 'global'),
+}
+
+# Names of the metrics of `tabac.distances.ImageDistance`.
+IMAGE_METRICS = ('uqi', 'rmse', 'ergas', 'scc', 'rase', 'vifp')
+
+DISTANCES = (
+    'topological',
+    'hausdorff',
+    'entropy',
+    'cubical',
+    'mse',
+) + IMAGE_METRICS + (
+    'mean',
+    'std',
+)
+
+
+def get_shape(name):
+    """Return sampler, batched sampler, and random state of a shape.
+
+    Parameters
+    ----------
+    name : str
+        Name of the shape; one of the keys of `SHAPES`.
+
+    Returns
+    -------
+    tuple
+        Shape sampler, batched shape sampler (or `None`), and source
+        of randomness of the sampler.
+    """
+    try:
+        module, sample_fn, batch_sample_fn, random_state = SHAPES[name]
+    except KeyError:
+        raise ValueError(f'Unknown shape: {name}') from None
+
+    module = importlib.import_module(module)
+    return (
+        getattr(module, sample_fn),
+        None if batch_sample_fn is None else getattr(module, batch_sample_fn),
+        random_state,
+    )
+
+
+def make_distance(
+    name,
+    shape=None,
+    n=None,
+    periodic=False,
+    filtration='rips',
+    max_edge_length=np.inf,
+    collapse_edges=False,
+    entropy_estimator='kde',
+):
+    """Create a distance function.
+
+    Parameters
+    ----------
+    name : str
+        Name of the distance; one of `DISTANCES`.
+
+    shape : str or None
+        Name of the shape the distance will be applied to.
+
+    n : int or None
+        Number of points of every sample.
+
+    periodic : bool
+        If set, distances between Vicsek samples respect the periodic
+        domain of the model, and cubical distances the periodic grid
+        axes recorded by image samples.
+
+    filtration, max_edge_length, collapse_edges
+        Options of :class:`tabac.distances.TopologicalDistance`.
+
+    entropy_estimator : str
+        Estimator of :class:`tabac.distances.EntropyDistance`.
+
+    Returns
+    -------
+    callable
+        Distance function.
+    """
+    # Importing the distances is cheap; their backends, such as
+    # giotto-tda, sklearn, and sewar, are only imported once used.
+    from tabac import distances
+
+    if name == 'topological':
+        return distances.TopologicalDistance(
+            filtration=filtration,
+            max_edge_length=max_edge_length,
+            collapse_edges=collapse_edges,
+        )
+    if name == 'hausdorff':
+        boxsize = None
+        if periodic and shape == 'vicsek':
+            from tabac.vicsek_new import vicsek_box_size
+            boxsize = vicsek_box_size(n)
+        return distances.HausdorffDistance(boxsize=boxsize)
+    if name == 'entropy':
+        return distances.EntropyDistance(estimator=entropy_estimator)
+    if name == 'cubical':
+        return distances.TopologicalDistanceCubical(
+            periodic=None if periodic else False,
+        )
+    if name == 'mse':
+        return distances.mse_distance
+    if name in IMAGE_METRICS:
+        return distances.ImageDistance(name)
+    if name == 'mean':
+        return distances.mean_distance
+    if name == 'std':
+        return distances.std_distance
+
+    raise ValueError(f'Unknown distance: {name}')
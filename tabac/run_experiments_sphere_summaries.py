@@ -1,30 +1,13 @@
-from tqdm import tqdm
-import subprocess
-import pickle
+"""Sphere experiments with summary statistics."""
 
-res_list_importance_scc = []
-res_list_importance_topological = []
-res_list_rejection_mean = []
-res_list_rejection_std = []
+import os
 
+from tabac.experiments import load_grid
+from tabac.experiments import run_grid
 
-for theta in tqdm(["1","5","10"]):
-    inner_list = []
-    for i in range(5):
-        result = subprocess.run(["python", "experiments_auxiliary.py", "--shape", "sphere", "--theta", theta, "-n", "100", "-N", "250", "--sampler", "rejection", "--distance", "mean"], capture_output=True, text=True)
-        fin_res = float(result.stdout)
-        inner_list.append(fin_res)
-    res_list_rejection_mean.append(inner_list)
+GRID = os.path.join(os.path.dirname(__file__), "grids", "sphere_summaries.toml")
 
-for theta in tqdm(["1","5","10"]):
-    inner_list = []
-    for i in range(5):
-        result = subprocess.run(["python", "experiments_auxiliary.py", "--shape", "sphere", "--theta", theta, "-n", "100", "-N", "250", "--sampler", "rejection", "--distance", "std"], capture_output=True, text=True)
-        fin_res = float(result.stdout)
-        inner_list.append(fin_res)
-    res_list_rejection_std.append(inner_list)
 
-res_dic = {"Sphere Rejection mean":res_list_rejection_mean, "Sphere Rejection std":res_list_rejection_std}
-
-with open('sphere.pkl', 'wb') as fp:
-    pickle.dump(res_dic, fp)
\ No newline at end of file
+if __name__ == "__main__":
+    # Finished experiments are logged and skipped when run again.
+    run_grid(load_grid(GRID))
@@ -1,30 +1,13 @@
-from tqdm import tqdm
-import subprocess
-import pickle
+"""Torus experiments with summary statistics."""
 
-res_list_rejection_mean = []
-res_list_rejection_std = []
+import os
 
+from tabac.experiments import load_grid
+from tabac.experiments import run_grid
 
-for R in tqdm([["1","2"], ["3","5"], ["5","10"]]):
-    inner_list = []
-    for i in range(5):
-        result = subprocess.run(["python", "experiments_auxiliary_torus.py", "--shape", "torus", "--theta", R[0], R[1], "-n", "100", "-N", "250", "--sampler", "rejection", "--distance", "mean"], capture_output=True, text=True)
-        fin_res = result.stdout
-        fin_res = [float(fin_res[:6]),float(fin_res.split(" ")[-1][:6])]
-        inner_list.append(fin_res)
-    res_list_rejection_mean.append(inner_list)
+GRID = os.path.join(os.path.dirname(__file__), "grids", "torus_summaries.toml")
 
-for R in tqdm([["1","2"], ["3","5"], ["5","10"]]):
-    inner_list = []
-    for i in range(5):
-        result = subprocess.run(["python", "experiments_auxiliary_torus.py", "--shape", "torus", "--theta", R[0], R[1], "-n", "100", "-N", "250", "--sampler", "rejection", "--distance", "std"], capture_output=True, text=True)
-        fin_res = result.stdout
-        fin_res = [float(fin_res[:6]),float(fin_res.split(" ")[-1][:6])]
-        inner_list.append(fin_res)
-    res_list_rejection_std.append(inner_list)
 
-res_dic = {"Torus Rejection mean":res_list_rejection_mean, "Torus Rejection std":res_list_rejection_std}
-
-with open('torus.pkl', 'wb') as fp:
-    pickle.dump(res_dic, fp)
\ No newline at end of file
+if __name__ == "__main__":
+    # Finished experiments are logged and skipped when run again.
+    run_grid(load_grid(GRID))
@@ -3,6 +3,91 @@
 import numpy as np
 
 
+class ImageSample(np.ndarray):
+    """Image-valued sample on a regular grid.
+
+    This thin subclass of `np.ndarray` stores an image in its natural
+    grid shape, i.e. `(n, m)` for 2D or `(n, m, k)` for 3D grids, or a
+    stack of such images with leading batch dimensions. In addition,
+    it records which of the trailing grid axes are periodic, so that
+    distances such as cubical persistence can take the boundary
+    conditions of the generating model into account.
+    """
+
+    def __new__(cls, data, periodic=False, ndim=None):
+        """Create new image sample.
+
+        Parameters
+        ----------
+        data : array_like
+            Image data in grid shape.
+
+        periodic : bool or sequence of bool
+            Whether the grid axes are periodic. A single value applies
+            to all grid axes.
+
+        ndim : int or None
+            Number of grid axes. If set to `None`, all axes of `data`
+            are grid axes, unless `periodic` is a sequence.
+        """
+        obj = np.asarray(data).view(cls)
+
+        if np.ndim(periodic) == 0:
+            periodic = (bool(periodic),) * (ndim or obj.ndim)
+
+        obj.periodic = tuple(bool(p) for p in periodic)
+        return obj
+
+    def __array_finalize__(self, obj):
+        self.periodic = getattr(obj, 'periodic', (False,) * self.ndim)
+
+    def __array_wrap__(self, obj, context=None, return_scalar=False):
+        # Reductions such as `mean()` yield scalars, not 0D images.
+        if obj.ndim == 0:
+            return obj[()]
+        return super().__array_wrap__(obj, context, return_scalar)
+
+    def __reduce__(self):
+        constructor, args, state = super().__reduce__()
+        return constructor, args, state + (self.periodic,)
+
+    def __setstate__(self, state):
+        self.periodic = state[-1]
+        super().__setstate__(state[:-1])
+
+    @property
+    def grid_shape(self):
+        """Shape of the grid, excluding any leading batch dimensions."""
+        return self.shape[self.ndim - len(self.periodic):]
+
+
+def as_image(x):
+    """Return `x` as an image in grid shape.
+
+    Image samples and arrays with at least two dimensions are returned
+    as they are. Flat vectors, as produced by earlier versions of the
+    percolation sampler, are reshaped into square images.
+
+    Parameters
+    ----------
+    x : array_like
+        Image data.
+
+    Returns
+    -------
+    np.array
+        View of `x` in grid shape.
+    """
+    x = np.asarray(x) if not isinstance(x, np.ndarray) else x
+
+    if x.ndim == 1:
+        n = int(np.sqrt(len(x)))
+        assert n * n == len(x), 'Flat images need to be square'
+        x = x.reshape(n, n)
+
+    return x
+
+
 def embed(data, ambient=50):
     """Embed `data` in `ambient` dimensions.
 
@@ -105,17 +190,199 @@ def sample_from_sphere(n=100, r=1, d=2, noise=None, ambient=None, seed=None):
     return np.asarray(data)
 
 
-def sample_from_percolation(n=100, p=.5, gray_level=255, seed=None):
+def sample_from_sphere_batch(
+    n=100,
+    r=1,
+    d=2,
+    noise=None,
+    ambient=None,
+    seed=None,
+):
+    """Sample a batch of spheres with one radius per batch entry.
+
+    This is the batched counterpart to :func:`sample_from_sphere`: all
+    point clouds are drawn with a single call to the random number
+    generator.
+
+    Parameters
+    -----------
+    n : int
+        Number of data points in each shape.
+
+    r : array_like of shape `(b,)`
+        Radius of each sphere in the batch.
+
+    d : int
+        Dimension of the spheres.
+
+    noise : float or None
+        Optional noise factor. If set, data coordinates will be
+        perturbed by a standard normal distribution, scaled by
+        `noise`.
+
+    ambient : int or None
+        Embed each sphere into a space with ambient dimension equal to
+        `ambient`. Each sphere is randomly rotated into this
+        high-dimensional space.
+
+    seed : int, instance of `np.random.Generator`, or `None`
+        Seed for the random number generator, or an instance of such
+        a generator. If set to `None`, the default random number
+        generator will be used.
+
+    Returns
+    -------
+    np.array
+        Array of sampled coordinates. If `ambient` is set, array will be
+        of shape `(b, n, ambient)`. Else, array will be of shape
+        `(b, n, d + 1)`.
+    """
     rng = np.random.default_rng(seed)
-    N = n * n
-    if p>1:
-        p = 1
-    data = np.zeros(N)
-    idx = np.array([bool(x) for x in np.random.binomial(1, p, N)])
+    r = np.atleast_1d(np.asarray(r, dtype=float))
+    data = rng.standard_normal((len(r), n, d + 1))
+
+    # Normalize points to the spheres
+    data *= (r[:, None] / np.linalg.norm(data, axis=2))[:, :, None]
+
+    if noise:
+        data += noise * rng.standard_normal(data.shape)
+
+    if ambient is not None:
+        assert ambient > d
+        data = np.stack([embed(X, ambient) for X in data])
 
-    data[idx] = np.random.randint(1, gray_level, idx.sum())
     return data
 
+
+def sample_from_percolation(n=100, p=.5, gray_level=255, seed=None):
+    """Sample a random greyscale image of size `n` times `n`.
+
+    Each pixel is non-zero with probability `p`, in which case its
+    value is drawn uniformly from `1, ..., gray_level - 1`.
+
+    Parameters
+    ----------
+    n : int
+        Size of the image.
+
+    p : float
+        Probability of a pixel to be non-zero; clipped to `[0, 1]`.
+
+    gray_level : float
+        Exclusive upper bound of the pixel values; truncated to an
+        integer and clipped to `[2, 256]`, so that values fit into
+        `np.uint8`.
+
+    seed : int, instance of `np.random.Generator`, or `None`
+        Seed for the random number generator, or an instance of such
+        a generator. If set to `None`, the default random number
+        generator will be used.
+
+    Returns
+    -------
+    ImageSample of shape `(n, n)` and type `np.uint8`
+        Sampled image.
+    """
+    return sample_from_percolation_batch(n, p, gray_level, seed=seed)[0]
+
+
+def sample_from_percolation_batch(n=100, p=.5, gray_level=255, seed=None):
+    """Sample a batch of greyscale images with one pair of parameters
+    per batch entry.
+
+    This is the batched counterpart to :func:`sample_from_percolation`:
+    all images are drawn with two calls to the random number generator.
+
+    Parameters
+    ----------
+    n : int
+        Size of each image.
+
+    p : array_like of shape `(b,)`
+        Probability of a pixel to be non-zero in each image.
+
+    gray_level : array_like of shape `(b,)`
+        Exclusive upper bound of the pixel values of each image.
+
+    seed : int, instance of `np.random.Generator`, or `None`
+        Seed for the random number generator, or an instance of such
+        a generator. If set to `None`, the default random number
+        generator will be used.
+
+    Returns
+    -------
+    ImageSample of shape `(b, n, n)` and type `np.uint8`
+        Sampled images.
+    """
+    rng = np.random.default_rng(seed)
+    p, gray_level = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(p, dtype=float)),
+        np.atleast_1d(np.asarray(gray_level, dtype=float)),
+    )
+
+    p = np.clip(p, 0, 1)[:, None, None]
+    high = np.clip(gray_level.astype(int), 2, 256)[:, None, None]
+
+    shape = (len(p), n, n)
+    data = rng.integers(1, high, size=shape, dtype=np.uint8)
+    data[rng.random(shape) >= p] = 0
+
+    return ImageSample(data, ndim=2)
+
+
+def _torus_angles(n, ratio, rng):
+    """Sample tube angles of a batch of tori by block rejection.
+
+    Angles follow the density proportional to ``1 + ratio * cos(x)``,
+    clipped to `[0, 2]` for self-intersecting tori, which makes the
+    points uniform on the surface of the torus. Candidates are drawn in
+    blocks sized by the acceptance rate of the envelope and topped up
+    until every torus has `n` angles.
+
+    Parameters
+    ----------
+    n : int
+        Number of angles per torus.
+
+    ratio : np.array of shape `(b,)`
+        Ratio of tube radius to torus radius of each torus.
+
+    rng : `np.random.Generator`
+        Random number generator.
+
+    Returns
+    -------
+    np.array of shape `(b, n)`
+        Sampled angles.
+    """
+    bound = np.minimum(1 + np.abs(ratio), 2)
+
+    angles = np.empty((len(ratio), n))
+    count = np.zeros(len(ratio), dtype=int)
+
+    while True:
+        todo = np.flatnonzero(count < n)
+        if len(todo) == 0:
+            return angles
+
+        # The acceptance rate is at least `1 / bound`; the margin keeps
+        # top-up rounds rare.
+        missing = n - count[todo]
+        size = int(np.ceil(1.1 * np.max(missing * bound[todo]))) + 8
+
+        x = rng.uniform(0, 2 * np.pi, size=(len(todo), size))
+        u = rng.uniform(0, 1, size=(len(todo), size))
+        density = np.clip(1 + ratio[todo, None] * np.cos(x), 0, 2)
+        accept = u * bound[todo, None] < density
+
+        # Keep the first `missing` accepted candidates of every torus.
+        position = np.cumsum(accept, axis=1) - 1
+        keep = accept & (position < missing[:, None])
+        rows = np.broadcast_to(todo[:, None], keep.shape)[keep]
+        angles[rows, (count[todo, None] + position)[keep]] = x[keep]
+        count[todo] += keep.sum(axis=1)
+
+
 def sample_from_torus(n, r=1, R=2, seed=None):
     """Sample points uniformly from torus.
 
@@ -138,30 +405,53 @@ def sample_from_torus(n, r=1, R=2, seed=None):
 
     Returns
     -------
-    torch.tensor of shape `(n, 3)`
-        Tensor of sampled coordinates.
+    np.array of shape `(n, 3)`
+        Array of sampled coordinates.
     """
-    rng = np.random.default_rng(seed)
-    angles = []
+    return sample_from_torus_batch(n, r, R, seed=seed)[0]
+
 
-    while len(angles) < n:
-        x = rng.uniform(0, 2 * np.pi)
-        y = rng.uniform(0, 1 / np.pi)
+def sample_from_torus_batch(n, r=1, R=2, seed=None):
+    """Sample a batch of tori with one pair of radii per batch entry.
 
-        f = (1.0 + (r / R) * np.cos(x)) / (2 * np.pi)
+    This is the batched counterpart to :func:`sample_from_torus`: the
+    angles of all tori are drawn in blocks with a few calls to the
+    random number generator.
 
-        if y < f:
-            psi = rng.uniform(0, 2 * np.pi)
-            angles.append((x, psi))
+    Parameters
+    ----------
+    n : int
+        Number of points to sample for each torus.
 
-    X = []
+    r : array_like of shape `(b,)`
+        Radius of the 'tube' of each torus.
+
+    R : array_like of shape `(b,)`
+        Radius of each torus, i.e. the distance from the centre of the
+        'tube' to the centre of the torus.
+
+    seed : int, instance of `np.random.Generator`, or `None`
+        Seed for the random number generator, or an instance of such
+        a generator. If set to `None`, the default random number
+        generator will be used.
+
+    Returns
+    -------
+    np.array of shape `(b, n, 3)`
+        Array of sampled coordinates.
+    """
+    rng = np.random.default_rng(seed)
+    r, R = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(r, dtype=float)),
+        np.atleast_1d(np.asarray(R, dtype=float)),
+    )
 
-    for theta, psi in angles:
-        a = R + r * np.cos(theta)
-        x = a * np.cos(psi)
-        y = a * np.sin(psi)
-        z = r * np.sin(theta)
+    theta = _torus_angles(n, r / R, rng)
+    psi = rng.uniform(0, 2 * np.pi, size=theta.shape)
 
-        X.append((x, y, z))
+    a = R[:, None] + r[:, None] * np.cos(theta)
 
-    return np.asarray(X)
\ No newline at end of file
+    return np.stack(
+        [a * np.cos(psi), a * np.sin(psi), r[:, None] * np.sin(theta)],
+        axis=-1,
+    )
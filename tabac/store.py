@@ -0,0 +1,380 @@
+"""Persistent storage of simulated samples."""
+
+import json
+import os
+
+from tqdm import tqdm
+import numpy as np
+
+from tabac.abc_functors import ABCResult
+from tabac.shapes import ImageSample
+
+
+class SimulationStore:
+    """Append-only on-disk store of simulated samples.
+
+    Samples of one shape and size are kept in a directory holding
+    memory-mapped `.npy` shards of a fixed number of samples and their
+    parameters, together with an `index.json` file. The index records
+    the number of stored samples and, for every appended chunk, the
+    random stream it was simulated with, so that stored samples can be
+    reproduced or re-scored with different distances later on. As the
+    samples are only meaningful together with the distribution their
+    parameters were drawn from, the index also records that prior.
+
+    Consecutive chunks of equal size simulated with consecutive child
+    streams of one root seed are recorded as a single run. The index
+    and the shards are written every `flush_interval` chunks and by
+    :meth:`flush`; chunks appended after the last flush are lost if a
+    process is interrupted, but the store remains consistent.
+    """
+
+    def __init__(
+        self,
+        root,
+        shape,
+        n,
+        shard_size=1024,
+        prior=None,
+        flush_interval=256,
+    ):
+        """Open or create a store.
+
+        Parameters
+        ----------
+        root : str
+            Root directory of the store. Samples are kept in the
+            subdirectory `f'{shape}_{n}'`.
+
+        shape : str
+            Name of the shape, e.g. 'sphere' or 'fluid'.
+
+        n : int
+            Number of points or grid size of every sample.
+
+        shard_size : int
+            Number of samples per shard. Ignored if the store exists.
+
+        prior : dict or None
+            Prior the parameters of the samples are drawn from, with
+            keys 'theta' and 'scale' as in
+            :class:`tabac.abc_functors.PriorSimulator`. If set, a store
+            holding samples of a different or unknown prior is refused.
+
+        flush_interval : int
+            Number of appended chunks after which the store is flushed.
+
+        Raises
+        ------
+        ValueError
+            If the store holds samples of a prior other than `prior`.
+        """
+        self.path = os.path.join(root, f'{shape}_{n}')
+        self._index_path = os.path.join(self.path, 'index.json')
+
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {
+                'shape': shape,
+                'n': n,
+                'shard_size': shard_size,
+                'count': 0,
+                'sample_shape': None,
+                'dtype': None,
+                'n_params': None,
+                'periodic': None,
+                'prior': None,
+                'chunks': [],
+            }
+
+        if prior is not None:
+            self._check_prior(prior)
+
+        self.flush_interval = flush_interval
+        self._shards = {}
+        self._unflushed = 0
+
+    def _check_prior(self, prior):
+        prior = {
+            'theta': [float(t) for t in np.atleast_1d(prior['theta'])],
+            'scale': float(prior['scale']),
+        }
+        recorded = self.index.get('prior')
+
+        if recorded is None:
+            if self.index['count'] > 0:
+                raise ValueError(
+                    f'Store {self.path} holds samples of an unknown prior'
+                )
+        elif (
+            len(recorded['theta']) != len(prior['theta'])
+            or not np.allclose(recorded['theta'], prior['theta'])
+            or not np.isclose(recorded['scale'], prior['scale'])
+        ):
+            raise ValueError(
+                f'Store {self.path} holds samples of the prior {recorded}, '
+                f'not {prior}'
+            )
+
+        self.index['prior'] = prior
+
+    def __len__(self):
+        return self.index['count']
+
+    def _shard_path(self, kind, i):
+        return os.path.join(self.path, f'{kind}_{i:05d}.npy')
+
+    def _shard(self, kind, i, mode='r'):
+        key = (kind, i, mode)
+        if key not in self._shards:
+            path = self._shard_path(kind, i)
+            if not os.path.exists(path):
+                if kind == 'samples':
+                    shape = tuple(self.index['sample_shape'])
+                    dtype = self.index['dtype']
+                else:
+                    shape = (self.index['n_params'],)
+                    dtype = float
+
+                np.lib.format.open_memmap(
+                    path,
+                    mode='w+',
+                    dtype=dtype,
+                    shape=(self.index['shard_size'],) + shape,
+                )
+
+            self._shards[key] = np.load(path, mmap_mode=mode)
+
+        return self._shards[key]
+
+    def _write_index(self):
+        # Replace the index atomically, so that an interrupted run does
+        # not leave a corrupted store behind.
+        tmp = self._index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self._index_path)
+
+    def append(self, thetas, samples, seed=None, batch_size=None):
+        """Append a chunk of samples.
+
+        Parameters
+        ----------
+        thetas : array_like
+            Parameters of shape `(m, p)`.
+
+        samples : sequence of array_like
+            Samples of equal shape.
+
+        seed : `np.random.SeedSequence` or None
+            Random stream the chunk was simulated with.
+
+        batch_size : int or None
+            Batch size the chunk was simulated with; required for
+            reproducing batched simulations from `seed`.
+        """
+        if len(samples) == 0:
+            return
+        thetas = np.asarray(thetas, dtype=float).reshape(len(samples), -1)
+
+        if self.index['sample_shape'] is None:
+            first = samples[0]
+            os.makedirs(self.path, exist_ok=True)
+            self.index['sample_shape'] = list(np.shape(first))
+            self.index['dtype'] = np.asarray(first).dtype.str
+            self.index['n_params'] = thetas.shape[1]
+            if isinstance(first, ImageSample):
+                self.index['periodic'] = list(first.periodic)
+
+        shape = tuple(self.index['sample_shape'])
+        for sample in samples:
+            if np.shape(sample) != shape:
+                raise ValueError(
+                    f'Expected samples of shape {shape}, '
+                    f'got {np.shape(sample)}'
+                )
+
+        start = self.index['count']
+        shard_size = self.index['shard_size']
+
+        for j, (theta, sample) in enumerate(zip(thetas, samples)):
+            i, k = divmod(start + j, shard_size)
+            self._shard('samples', i, 'r+')[k] = sample
+            self._shard('thetas', i, 'r+')[k] = theta
+
+        self.index['count'] += len(samples)
+        self._record_chunk(start, len(samples), seed, batch_size)
+
+        self._unflushed += 1
+        if self._unflushed >= self.flush_interval:
+            self.flush()
+
+    def _record_chunk(self, start, size, seed, batch_size):
+        chunk = {
+            'start': start,
+            'size': size,
+            'batch_size': batch_size,
+            'entropy': None if seed is None else str(seed.entropy),
+            'spawn_key': None if seed is None else list(seed.spawn_key),
+            'n_chunks': 1,
+        }
+
+        # Extend the previous run if the chunk continues it, i.e. has
+        # the same size and the next child stream of the same seed.
+        if self.index['chunks']:
+            run = self.index['chunks'][-1]
+            n_chunks = run.get('n_chunks', 1)
+
+            key = run['spawn_key']
+            if key:
+                key = key[:-1] + [key[-1] + n_chunks]
+            elif key is not None:
+                key = False  # Root streams cannot be continued.
+
+            if (
+                run['start'] + n_chunks * run['size'] == start
+                and run['size'] == size
+                and run['batch_size'] == batch_size
+                and run['entropy'] == chunk['entropy']
+                and key == chunk['spawn_key']
+            ):
+                run['n_chunks'] = n_chunks + 1
+                return
+
+        self.index['chunks'].append(chunk)
+
+    def flush(self):
+        """Write the appended samples and the index to disk."""
+        for (_, _, mode), shard in self._shards.items():
+            if mode != 'r':
+                shard.flush()
+
+        if self.index['count'] > 0:
+            self._write_index()
+        self._unflushed = 0
+
+    def append_results(self, results, seed=None, batch_size=None):
+        """Append the samples of a chunk of `ABCResult` records."""
+        self.append(
+            [np.ravel(r.theta) for r in results],
+            [r.sample for r in results],
+            seed,
+            batch_size,
+        )
+
+    def seeds(self):
+        """Return the random streams of all stored chunks.
+
+        Returns
+        -------
+        list of tuple
+            Start index, size, batch size, and `np.random.SeedSequence`
+            (or `None` for unseeded chunks) of every chunk.
+        """
+        seeds = []
+
+        for run in self.index['chunks']:
+            for c in range(run.get('n_chunks', 1)):
+                seed = None
+                if run['entropy'] is not None:
+                    key = list(run['spawn_key'])
+                    key[-1] += c
+                    seed = np.random.SeedSequence(
+                        int(run['entropy']), spawn_key=tuple(key)
+                    )
+
+                seeds.append((
+                    run['start'] + c * run['size'],
+                    run['size'],
+                    run['batch_size'],
+                    seed,
+                ))
+
+        return seeds
+
+    def _wrap(self, samples):
+        if self.index['periodic'] is None:
+            return samples
+        return ImageSample(samples, periodic=self.index['periodic'])
+
+    def iter_chunks(self, size=256):
+        """Iterate over the stored samples in chunks.
+
+        Parameters
+        ----------
+        size : int
+            Maximum number of samples per chunk. Chunks do not cross
+            shard boundaries.
+
+        Yields
+        ------
+        tuple
+            Parameter matrix and stacked samples of the chunk. The
+            samples are read-only views of the memory-mapped shards.
+        """
+        shard_size = self.index['shard_size']
+
+        for start in range(0, len(self), shard_size):
+            i = start // shard_size
+            stop = min(start + shard_size, len(self))
+            thetas = self._shard('thetas', i)
+            samples = self._shard('samples', i)
+
+            for k in range(0, stop - start, size):
+                end = min(k + size, stop - start)
+                yield np.array(thetas[k:end]), self._wrap(samples[k:end])
+
+    def thetas(self):
+        """Return the parameters of all stored samples."""
+        size = self.index['shard_size']
+        chunks = [thetas for thetas, _ in self.iter_chunks(size)]
+        if not chunks:
+            return np.empty((0, self.index['n_params'] or 0))
+        return np.concatenate(chunks)
+
+
+def rescore(store, y, distance_fn, chunk_size=256):
+    """Calculate distances of stored samples to an observed sample.
+
+    Parameters
+    ----------
+    store : SimulationStore
+        Store holding simulated samples.
+
+    y : array_like
+        Observed sample.
+
+    distance_fn : callable
+        Function for calculating the distance between observed and
+        simulated samples. If it provides a ``batch_distance(y, zs)``
+        method, every chunk is scored with one call.
+
+    chunk_size : int
+        Number of samples that are read from the store at once.
+
+    Returns
+    -------
+    List of `ABCResult`
+        Results for all stored samples, in order of storage. The
+        samples are views of the memory-mapped shards. Their parameters
+        follow the prior recorded by the store, which estimators of the
+        parameters need to use.
+    """
+    results = []
+
+    with tqdm(total=len(store), desc='Re-scoring') as progress:
+        for thetas, samples in store.iter_chunks(chunk_size):
+            if len(samples) > 1 and hasattr(distance_fn, 'batch_distance'):
+                distances = distance_fn.batch_distance(y, list(samples))
+            else:
+                distances = [distance_fn(y, s) for s in samples]
+
+            results.extend(
+                ABCResult(d, list(theta), s)
+                for d, theta, s in zip(distances, thetas, samples)
+            )
+            progress.update(len(samples))
+
+    return results
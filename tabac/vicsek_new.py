@@ -2,8 +2,6 @@ import numpy as np
 import scipy as sp
 from scipy import sparse
 from scipy.spatial import cKDTree
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 
 
 class Vicsek:
@@ -53,6 +51,10 @@ class Vicsek:
         return qv,
 
     def plot(self):
+        # matplotlib is only needed for the animation, not for sampling.
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
         pos = self.pos
 
         global orient
@@ -95,9 +97,16 @@ class Vicsek:
 
 
 t = 5
+rho = 3
+
+
+def vicsek_box_size(n):
+    """Return side length of the periodic domain for `n` particles."""
+    return int(np.sqrt(n / rho))
+
+
 def sample_from_vicsek(n, eta, *args, **kwargs):
-    rho = 3
-    model = Vicsek(int(np.sqrt(n / rho)), rho, .5, eta)
+    model = Vicsek(vicsek_box_size(n), rho, .5, eta)
     for i in range(t):
         pos = model.step()[0]
     return pos